@@ -0,0 +1,51 @@
+# avatars.py
+from PIL import Image, ImageOps
+
+from .models import Profile
+from .thumbnails import save_image, to_rgb, version
+
+# Square sizes in pixels, each written as JPEG and WebP. Re-encoding drops
+# EXIF (camera, GPS) along with everything else the upload carried.
+SIZES = {'small': 64, 'medium': 160, 'large': 400}
+FORMATS = {'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+           'webp': ('WEBP', {'quality': 80, 'method': 6})}
+
+
+def variant_name(user_id, picture_name, size, fmt):
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return f'profile_pictures/variants/{user_id}-{version(picture_name)}-{size}.{ext}'
+
+
+def variant_names(user_id, picture_name):
+    return [variant_name(user_id, picture_name, size, fmt) for size in SIZES for fmt in FORMATS]
+
+
+def render_variants(profile_id):
+    """
+    Write the variants of a profile's picture and record them in
+    Profile.picture_variants. Does nothing when they are already current.
+    """
+    profile = Profile.objects.filter(id=profile_id).only(
+        'id', 'user_id', 'profile_picture', 'picture_variants').first()
+    if profile is None or not profile.profile_picture:
+        return False
+    name = profile.profile_picture.name
+    if (profile.picture_variants or {}).get('version') == version(name):
+        return False
+
+    with Image.open(profile.profile_picture.path) as original:
+        original.draft('RGB', (max(SIZES.values()) * 2,) * 2)
+        image = to_rgb(original)
+
+    variants = {'version': version(name), 'sizes': {}}
+    for size, pixels in sorted(SIZES.items(), key=lambda item: -item[1]):
+        image = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        variants['sizes'][size] = {}
+        for fmt in FORMATS:
+            variant = variant_name(profile.user_id, name, size, fmt)
+            pil_format, options = FORMATS[fmt]
+            save_image(image, variant, pil_format, **options)
+            variants['sizes'][size][fmt] = variant
+
+    Profile.objects.filter(id=profile.id).update(picture_variants=variants)
+    return True
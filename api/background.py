@@ -0,0 +1,50 @@
+# background.py
+import atexit
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executors = {}
+
+
+def pool_sizes():
+    return {
+        'default': settings.BACKGROUND_WORKERS,
+        'conversion': settings.CONVERSION_WORKERS,
+    }
+
+
+def get_executor(pool='default'):
+    if pool not in _executors:
+        executor = ThreadPoolExecutor(
+            max_workers=pool_sizes()[pool],
+            thread_name_prefix=f'api-{pool}')
+        atexit.register(executor.shutdown, wait=False)
+        _executors[pool] = executor
+    return _executors[pool]
+
+
+def _run(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args, pool='default'):
+    """
+    Run `func(*args)` on a bounded in-process worker pool once the current
+    transaction commits, so the task sees the rows the request wrote. Work
+    lost to a restart is picked up again by the matching management command.
+
+    Slow jobs (document conversion) get a pool of their own so they cannot
+    hold up the quick post-upload tasks.
+    """
+    transaction.on_commit(lambda: get_executor(pool).submit(_run, func, args))
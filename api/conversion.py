@@ -0,0 +1,321 @@
+# conversion.py
+import hashlib
+import importlib.util
+import os
+import pathlib
+import posixpath
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, F, Q, Sum
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .background import run_in_background
+from .downloads import can_download
+from .models import Blob, ConversionJob, ConvertedPdf, Folder_Files
+from .storage import is_blob
+
+PENDING = [ConversionJob.QUEUED, ConversionJob.RUNNING]
+
+# Part of every cache key: bump it when a converter change should make
+# earlier results stale.
+CONVERTER_VERSION = 1
+
+JOB_SIGNING_SALT = 'api.conversion'
+
+
+class ConversionError(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+def source_from_url(file_url):
+    """
+    Path below MEDIA_ROOT named by a media URL or by a file's download URL,
+    or None if it points elsewhere. Whether the caller may read it is up to
+    can_read_source().
+    """
+    path = unquote(urlparse(file_url).path)
+    try:
+        match = resolve(path)
+    except Resolver404:
+        match = None
+    if match is not None and match.url_name == 'file-download':
+        f = Folder_Files.objects.filter(id=match.kwargs['file_id']).only('file').first()
+        return f.file.name if f and f.file else None
+    prefix = urlparse(settings.MEDIA_URL).path
+    if not path.startswith(prefix):
+        return None
+    relative = posixpath.normpath(path[len(prefix):])
+    if relative in ('.', '') or relative.startswith(('..', '/')):
+        return None
+    return relative
+
+
+def can_read_source(user, source, token=None):
+    """
+    Whether `user` may convert, and read the conversion of, the media file
+    `source`. Paths outside PROTECTED_MEDIA_PREFIXES are public already; a
+    stored file needs a Folder_Files row that the download endpoint would
+    let the user (or the holder of `token`, a download signature) open.
+    """
+    if not source.startswith(tuple(settings.PROTECTED_MEDIA_PREFIXES)):
+        return True
+    rows = Folder_Files.objects.filter(file=source).only('id', 'is_confidential', 'uploaded_by')
+    return any(can_download(user, f, token) for f in rows)
+
+
+def sign_job(job_id):
+    """A token that lets its holder poll and fetch one job for DOWNLOAD_URL_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=JOB_SIGNING_SALT).sign(str(job_id)).split(':', 1)[1]
+
+
+def can_read_job(user, job, token=None):
+    if token:
+        try:
+            signing.TimestampSigner(salt=JOB_SIGNING_SALT).unsign(
+                f'{job.id}:{token}', max_age=settings.DOWNLOAD_URL_MAX_AGE)
+            return True
+        except signing.BadSignature:
+            pass
+    return can_read_source(user, job.source)
+
+
+def media_path(relative):
+    return os.path.join(settings.MEDIA_ROOT, relative)
+
+
+def _run_command(args, timeout):
+    # A new session lets a timeout kill the whole process group; soffice
+    # forks soffice.bin, which would otherwise outlive the wrapper.
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            start_new_session=True)
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.communicate()
+        raise ConversionError(f"{os.path.basename(args[0])} timed out after {timeout}s")
+    if proc.returncode != 0:
+        lines = stderr.decode(errors='replace').strip().splitlines()
+        raise ConversionError(lines[-1] if lines else f"exit status {proc.returncode}")
+
+
+def libreoffice_binary():
+    return settings.LIBREOFFICE_BINARY or shutil.which('soffice') or shutil.which('libreoffice')
+
+
+def convert_with_libreoffice(source, workdir, timeout):
+    binary = libreoffice_binary()
+    if not binary:
+        return None
+    # Each run gets its own profile; concurrent runs sharing one fail.
+    profile = pathlib.Path(workdir, 'profile').as_uri()
+    outdir = os.path.join(workdir, 'out')
+    _run_command([binary, f'-env:UserInstallation={profile}', '--headless',
+                  '--convert-to', 'pdf', '--outdir', outdir, source], timeout)
+    name = os.path.splitext(os.path.basename(source))[0] + '.pdf'
+    return os.path.join(outdir, name)
+
+
+def convert_with_docx2pdf(source, workdir, timeout):
+    # docx2pdf drives Microsoft Word, so it only helps on Windows and macOS
+    # hosts that have Word. It runs in a child process to get a timeout.
+    if sys.platform not in ('win32', 'darwin') or not source.lower().endswith('.docx'):
+        return None
+    if importlib.util.find_spec('docx2pdf') is None:
+        return None
+    output = os.path.join(workdir, 'output.pdf')
+    _run_command([sys.executable, '-c',
+                  'import sys; from docx2pdf import convert; convert(sys.argv[1], sys.argv[2])',
+                  source, output], timeout)
+    return output
+
+
+def copy_pdf(source, workdir, timeout):
+    if not source.lower().endswith('.pdf'):
+        return None
+    output = os.path.join(workdir, 'output.pdf')
+    shutil.copyfile(source, output)
+    return output
+
+
+CONVERTERS = [
+    ('copy', copy_pdf),
+    ('libreoffice', convert_with_libreoffice),
+    ('docx2pdf', convert_with_docx2pdf),
+]
+
+
+def convert_file(source, destination, timeout):
+    """
+    Convert `source` to a PDF at `destination` with the first converter that
+    is available for it. Returns the converter's name.
+    """
+    errors = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, converter in CONVERTERS:
+            try:
+                output = converter(source, workdir, timeout)
+            except ConversionError as e:
+                errors.append(f"{name}: {e}")
+                continue
+            if output is None:
+                continue
+            if not os.path.exists(output):
+                errors.append(f"{name}: produced no PDF")
+                continue
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.move(output, destination)
+            return name
+    raise ConversionError('; '.join(errors) or "No converter available for this file type")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(sha256):
+    return f'{sha256}-v{CONVERTER_VERSION}'
+
+
+def cache_path(sha256):
+    return posixpath.join('converted', sha256[:2], f'{cache_key(sha256)}.pdf')
+
+
+def cached_pdf(sha256):
+    """The cache entry for this content, marked as used, or None on a miss."""
+    entry = ConvertedPdf.objects.filter(key=cache_key(sha256)).first()
+    if entry is None:
+        return None
+    if not os.path.exists(media_path(entry.path)):
+        entry.delete()
+        return None
+    ConvertedPdf.objects.filter(id=entry.id).update(last_used_at=timezone.now())
+    return entry
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used cache entries until the cache fits in
+    `max_bytes` (CONVERSION_CACHE_MAX_BYTES by default). Returns the number
+    of entries removed.
+    """
+    if max_bytes is None:
+        max_bytes = settings.CONVERSION_CACHE_MAX_BYTES
+    total = ConvertedPdf.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    removed = 0
+    for entry in ConvertedPdf.objects.order_by('last_used_at', 'id').iterator():
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(media_path(entry.path))
+        except FileNotFoundError:
+            pass
+        entry.delete()
+        total -= entry.size_bytes
+        removed += 1
+    return removed
+
+
+def cache_stats():
+    stats = ConversionJob.objects.aggregate(
+        hits=Count('id', filter=Q(cache_hit=True)),
+        misses=Count('id', filter=Q(cache_hit=False)))
+    stats.update(ConvertedPdf.objects.aggregate(entries=Count('id'), total_bytes=Sum('size_bytes')))
+    stats['total_bytes'] = stats['total_bytes'] or 0
+    stats['max_bytes'] = settings.CONVERSION_CACHE_MAX_BYTES
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
+
+
+def known_sha256(source):
+    """SHA-256 of a stored blob, known without reading it; '' for other files."""
+    if not is_blob(source):
+        return ''
+    return Blob.objects.filter(path=source).values_list('sha256', flat=True).first() or ''
+
+
+def enqueue(source):
+    """
+    Return a conversion job for `source` (relative to MEDIA_ROOT). Content
+    that was converted before is answered from the cache with a finished
+    job; otherwise a pending job for the same content is reused, or a new
+    one is queued. The source is never read here: files that aren't blobs
+    are hashed by the worker.
+    """
+    sha256 = known_sha256(source)
+    if sha256:
+        entry = cached_pdf(sha256)
+        if entry is not None:
+            return ConversionJob.objects.create(
+                source=source, source_sha256=sha256, cache_hit=True, status=ConversionJob.DONE,
+                output=entry.path, converter=entry.converter, finished_at=timezone.now())
+
+    same = Q(source_sha256=sha256) if sha256 else Q(source=source)
+    job = ConversionJob.objects.filter(same, status__in=PENDING).first()
+    if job is not None:
+        return job
+    if ConversionJob.objects.filter(status=ConversionJob.QUEUED).count() >= settings.CONVERSION_MAX_PENDING:
+        raise QueueFull()
+    job = ConversionJob.objects.create(source=source, source_sha256=sha256)
+    run_in_background(run_job, job.id, pool='conversion')
+    return job
+
+
+def run_job(job_id):
+    # The conditional update makes sure only one worker runs a job.
+    claimed = ConversionJob.objects.filter(id=job_id, status=ConversionJob.QUEUED).update(
+        status=ConversionJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1)
+    if not claimed:
+        return
+    job = ConversionJob.objects.get(id=job_id)
+    try:
+        if not os.path.exists(media_path(job.source)):
+            raise ConversionError("Source file no longer exists")
+        sha256 = job.source_sha256
+        if not sha256:
+            sha256 = file_sha256(media_path(job.source))
+            ConversionJob.objects.filter(id=job_id).update(source_sha256=sha256)
+        entry = cached_pdf(sha256)
+        if entry is not None:
+            ConversionJob.objects.filter(id=job_id).update(cache_hit=True)
+        else:
+            output = cache_path(sha256)
+            converter = convert_file(media_path(job.source), media_path(output),
+                                     settings.CONVERSION_TIMEOUT)
+            entry, _ = ConvertedPdf.objects.update_or_create(
+                key=cache_key(sha256),
+                defaults={'path': output, 'converter': converter, 'last_used_at': timezone.now(),
+                          'size_bytes': os.path.getsize(media_path(output))})
+    except Exception as e:
+        ConversionJob.objects.filter(id=job_id).update(
+            status=ConversionJob.FAILED, error=str(e), finished_at=timezone.now())
+        return
+    ConversionJob.objects.filter(id=job_id).update(
+        status=ConversionJob.DONE, output=entry.path, converter=entry.converter, error='',
+        finished_at=timezone.now())
+    evict()
+
+
+def requeue_stale():
+    """Put jobs that were running when their process died back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.CONVERSION_TIMEOUT * 2)
+    return ConversionJob.objects.filter(
+        status=ConversionJob.RUNNING, started_at__lt=cutoff).update(status=ConversionJob.QUEUED)
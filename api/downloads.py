@@ -0,0 +1,131 @@
+# downloads.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+SIGNING_SALT = 'api.downloads'
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def sign_download(file_id):
+    """A token that lets its holder download one file for DOWNLOAD_URL_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(file_id)).split(':', 1)[1]
+
+
+def valid_signature(file_id, token):
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            f'{file_id}:{token}', max_age=settings.DOWNLOAD_URL_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def can_download(user, f, token=None):
+    """Anyone may download ordinary files; confidential ones need staff, the uploader or a signed URL."""
+    if not f.is_confidential:
+        return True
+    if user.is_authenticated and (user.is_staff or user.id == f.uploaded_by_id):
+        return True
+    return bool(token) and valid_signature(f.id, token)
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to send the
+    whole file (no header, or one this endpoint doesn't serve, such as
+    multiple ranges), or 'unsatisfiable'.
+    """
+    match = RANGE.match(header or '')
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(request, f):
+    """Send the stored file of a Folder_Files row, see media_response()."""
+    return media_response(request, f.file.name, content_type=f.content_type,
+                          filename=f.file_name, private=f.is_confidential)
+
+
+def media_response(request, name, content_type=None, filename=None, private=False):
+    """
+    Send the file stored at MEDIA_ROOT/name. With FILE_DOWNLOAD_BACKEND
+    'nginx' or 'sendfile' the front server transfers it; otherwise it is
+    streamed from here with support for conditional and single-range requests.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    filename = filename or os.path.basename(name)
+    headers = {
+        'Content-Type': content_type,
+        'Content-Disposition': f"inline; filename*=UTF-8''{quote(filename)}",
+        'Cache-Control': 'private, no-cache' if private else 'public, max-age=3600',
+    }
+
+    backend = settings.FILE_DOWNLOAD_BACKEND
+    if backend == 'nginx':
+        headers['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(name)
+        return HttpResponse(headers=headers)
+    if backend == 'sendfile':
+        headers['X-Sendfile'] = path
+        return HttpResponse(headers=headers)
+
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = quote_etag(f'{size:x}-{int(stat.st_mtime):x}')
+    last_modified = int(stat.st_mtime)
+    headers.update({'ETag': etag, 'Last-Modified': http_date(last_modified), 'Accept-Ranges': 'bytes'})
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers.setdefault(header, value)
+        return not_modified
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range != etag \
+            and parse_http_date_safe(if_range) != last_modified:
+        byte_range = None  # the client's partial copy is stale
+    if byte_range == 'unsatisfiable':
+        headers['Content-Range'] = f'bytes */{size}'
+        return HttpResponse(status=416, headers=headers)
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_read(path, start, length), headers=headers,
+                                     status=206 if byte_range else 200)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,148 @@
+# folder_stats.py
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+
+from .models import Folders, FolderStats
+
+FileState = namedtuple(
+    'FileState', ['folder_id', 'is_archive', 'is_backup', 'size_bytes', 'date_creation'])
+
+COUNTERS = ['file_count', 'archived_count', 'backup_count', 'total_bytes']
+
+
+def file_state(file):
+    """Snapshot of the columns of a Folder_Files row that feed FolderStats."""
+    return FileState(file.folder_id, file.is_archive, file.is_backup,
+                     file.size_bytes, file.date_creation)
+
+
+def _contribution(state, count=1):
+    # `count` rows sharing the flags of `state`, size_bytes being their total.
+    return {
+        'file_count': 0 if state.is_archive else count,
+        'archived_count': count if state.is_archive else 0,
+        'backup_count': count if state.is_backup else 0,
+        'total_bytes': 0 if state.is_archive else state.size_bytes,
+    }
+
+
+def record_changes(changes):
+    """
+    Apply (before, after) FileState pairs to the folder counters.
+
+    `before` is None for a new row and `after` is None for a deleted one, so
+    creates, deletes, flag changes and moves between folders are all the same
+    operation. Must be called in the transaction that changed the rows.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    last_upload = {}
+    for before, after in changes:
+        if before is not None and before.folder_id is not None:
+            for key, value in _contribution(before).items():
+                deltas[before.folder_id][key] -= value
+        if after is not None and after.folder_id is not None:
+            for key, value in _contribution(after).items():
+                deltas[after.folder_id][key] += value
+            if before is None and after.date_creation is not None:
+                current = last_upload.get(after.folder_id)
+                if current is None or after.date_creation > current:
+                    last_upload[after.folder_id] = after.date_creation
+    apply_deltas(deltas, last_upload)
+
+
+def bulk_change_deltas(files, changes=None):
+    """
+    Counter deltas of an UPDATE of `changes` over the Folder_Files queryset
+    `files`, or of a DELETE of it when `changes` is None, from one aggregate
+    grouped by folder and flags however many rows match. Read them before
+    running the statement and pass them to apply_deltas() after it, in the
+    same transaction.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    groups = (files.order_by().values('folder_id', 'is_archive', 'is_backup')
+              .annotate(count=Count('id'), size=Sum('size_bytes')))
+    for group in groups:
+        before = FileState(group['folder_id'], group['is_archive'], group['is_backup'],
+                           group['size'] or 0, None)
+        states = [(before, -1)]
+        if changes is not None:
+            states.append((before._replace(**changes), 1))
+        for state, sign in states:
+            if state.folder_id is not None:
+                for key, value in _contribution(state, group['count']).items():
+                    deltas[state.folder_id][key] += sign * value
+    return deltas
+
+
+def apply_deltas(deltas, last_upload=None):
+    last_upload = last_upload or {}
+    with transaction.atomic():
+        missing = []
+        for folder_id, delta in deltas.items():
+            fields = {key: F(key) + value for key, value in delta.items() if value}
+            if folder_id in last_upload:
+                uploaded_at = last_upload[folder_id]
+                fields['last_upload_at'] = Case(
+                    When(Q(last_upload_at__isnull=True) | Q(last_upload_at__lt=uploaded_at),
+                         then=Value(uploaded_at)),
+                    default=F('last_upload_at'),
+                )
+            if not fields:
+                continue
+            if not FolderStats.objects.filter(folder_id=folder_id).update(**fields):
+                missing.append(folder_id)
+        if missing:
+            # No counters yet: build them from the rows, which already
+            # include this change.
+            recompute(missing)
+
+
+def record_change(before, after):
+    record_changes([(before, after)])
+
+
+def recompute(folder_ids=None):
+    """Rebuild FolderStats rows from Folder_Files and return them."""
+    folders = Folders.objects.all()
+    if folder_ids is not None:
+        folders = folders.filter(id__in=folder_ids)
+    not_archived = Q(folder_files__is_archive=False)
+    folders = folders.annotate(
+        stat_file_count=Count('folder_files', filter=not_archived),
+        stat_archived_count=Count('folder_files', filter=Q(folder_files__is_archive=True)),
+        stat_backup_count=Count('folder_files', filter=Q(folder_files__is_backup=True)),
+        stat_total_bytes=Sum('folder_files__size_bytes', filter=not_archived),
+        stat_last_upload_at=Max('folder_files__date_creation'),
+    ).values('id', 'stat_file_count', 'stat_archived_count', 'stat_backup_count',
+             'stat_total_bytes', 'stat_last_upload_at')
+
+    stats = [
+        FolderStats(
+            folder_id=row['id'],
+            file_count=row['stat_file_count'],
+            archived_count=row['stat_archived_count'],
+            backup_count=row['stat_backup_count'],
+            total_bytes=row['stat_total_bytes'] or 0,
+            last_upload_at=row['stat_last_upload_at'],
+        )
+        for row in folders
+    ]
+    FolderStats.objects.bulk_create(
+        stats,
+        update_conflicts=True,
+        unique_fields=['folder'],
+        update_fields=COUNTERS + ['last_upload_at'],
+    )
+    return stats
+
+
+def stats_for_folder(folder):
+    """Return the FolderStats of a folder, building it if it was never recorded."""
+    try:
+        return folder.stats
+    except FolderStats.DoesNotExist:
+        stats = recompute([folder.id])[0]
+        folder.stats = stats
+        return stats
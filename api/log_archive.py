@@ -0,0 +1,74 @@
+# log_archive.py
+import gzip
+import json
+import os
+from datetime import timedelta
+from itertools import groupby
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Logs
+
+# Log rows past the retention age are appended to one gzip'd JSON-lines file
+# per local day, LOG_ARCHIVE_DIR/YYYY/MM/logs-YYYY-MM-DD.jsonl.gz, and then
+# deleted from the table. Each run appends a new gzip member, which gzip
+# readers treat as one stream. A crash between writing and deleting leaves
+# rows that are archived again on the next run, so readers skip repeated ids.
+
+
+def archive_path(day):
+    return Path(settings.LOG_ARCHIVE_DIR) / f"{day:%Y}" / f"{day:%m}" / f"logs-{day:%Y-%m-%d}.jsonl.gz"
+
+
+def _columns():
+    return [f.attname for f in Logs._meta.concrete_fields]
+
+
+def _local_day(row):
+    return timezone.localtime(row['log_date']).date()
+
+
+def archive_logs(cutoff, batch_size=1000):
+    """Move rows logged before `cutoff` into the archive; returns the count."""
+    columns = _columns()
+    total = 0
+    while True:
+        rows = list(Logs.objects.filter(log_date__lt=cutoff)
+                    .order_by('log_date', 'id').values(*columns)[:batch_size])
+        if not rows:
+            return total
+        for day, day_rows in groupby(rows, key=_local_day):
+            path = archive_path(day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as fh:
+                    for row in day_rows:
+                        row['log_date'] = row['log_date'].isoformat()
+                        fh.write(json.dumps(row).encode() + b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+        with transaction.atomic():
+            Logs.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        total += len(rows)
+
+
+def iter_archived_logs(start, end):
+    """Yield archived log rows logged from day `start` to day `end` inclusive, oldest first."""
+    day = start
+    while day <= end:
+        path = archive_path(day)
+        if path.exists():
+            seen = set()
+            with gzip.open(path, 'rt') as fh:
+                for line in fh:
+                    row = json.loads(line)
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                    row['log_date'] = parse_datetime(row['log_date'])
+                    yield row
+        day += timedelta(days=1)
@@ -0,0 +1,73 @@
+# log_buffer.py
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Logs
+from .log_fields import fill_structured_fields
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedLogWriter:
+    """
+    Collects Logs rows in memory and writes them with one bulk_create when
+    `max_size` entries are waiting or `max_delay` seconds after the first
+    one arrived, whichever comes first. Pending entries are flushed at exit.
+
+    log_date is set when the batch is written, so it can lag the event by up
+    to `max_delay` seconds.
+    """
+
+    def __init__(self, max_size, max_delay):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def write(self, **fields):
+        with self._lock:
+            self._pending.append(Logs(**fields))
+            full = len(self._pending) >= self.max_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        with self._lock:
+            entries, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not entries:
+            return 0
+        try:
+            fill_structured_fields(entries)
+            with transaction.atomic():
+                Logs.objects.bulk_create(entries, batch_size=500)
+        except Exception:
+            logger.exception("Dropped %d buffered log entries", len(entries))
+            return 0
+        return len(entries)
+
+
+log_buffer = BufferedLogWriter(settings.LOG_BUFFER_SIZE, settings.LOG_BUFFER_DELAY)
+
+
+def log_event(info1, info2=None, info3=None, info4=None):
+    """Record a log entry without a write transaction of its own."""
+    log_buffer.write(info1=info1, info2=info2, info3=info3, info4=info4)
@@ -0,0 +1,80 @@
+# log_fields.py
+import re
+
+from django.contrib.auth.models import User
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
+
+# Clients write log entries as sentences in info1 ("Edmar moved a.png to
+# archive"). These patterns recover the structured columns from them; they
+# are tried in order, so the more specific ones come first.
+MESSAGE_PATTERNS = [
+    (re.compile(r'^(?P<actor>.*?)\s*has logged in to the system$'), 'login', 'user'),
+    (re.compile(r'^(?P<actor>.+?) uploaded a file named "(?P<target>.*)"$'), 'upload', 'file'),
+    (re.compile(r'^(?P<actor>.+?) moved (?P<target>.+) to archive$'), 'archive', 'file'),
+    (re.compile(r'^(?P<actor>.+?) restored the file (?P<target>.+)$'), 'restore', 'file'),
+    (re.compile(r'^(?P<actor>.+?) deleted the file (?P<target>.+) permanently from archives$'), 'delete_permanent', 'file'),
+    (re.compile(r'^(?P<actor>.+?) deleted the folder "(?P<target>.*)"$'), 'delete', 'folder'),
+    (re.compile(r'^(?P<actor>.+?) deleted (?P<target>.+)$'), 'delete', 'file'),
+    (re.compile(r'^(?P<actor>.+?) renamed the folder "(?P<old>.*)" to "(?P<target>.*)"$'), 'rename', 'folder'),
+    (re.compile(r'^(?P<actor>.+?) added a folder named (?P<target>.+)$'), 'create', 'folder'),
+]
+
+
+def parse_message(info1):
+    """Return (actor name, action, target type, target name) read from a log sentence."""
+    text = (info1 or '').strip()
+    for pattern, action, target_type in MESSAGE_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            actor = match.group('actor').strip()
+            target = match.groupdict().get('target') or actor
+            return actor, action, target_type, target.strip()[:255]
+    return '', 'other', '', ''
+
+
+def resolve_actors(names):
+    """
+    Map actor names to user ids with one query. A name matches a user's full
+    name, then username, then first name; names that match more than one user
+    at the same level stay unresolved.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    users = (User.objects
+             .annotate(full_name=Concat('first_name', Value(' '), 'last_name'))
+             .filter(Q(full_name__in=names) | Q(username__in=names) | Q(first_name__in=names))
+             .values_list('id', 'full_name', 'username', 'first_name'))
+    resolved = {}
+    for level in (1, 2, 3):
+        matches = {}
+        for user in users:
+            if user[level] in names:
+                matches.setdefault(user[level], set()).add(user[0])
+        for name, ids in matches.items():
+            if name not in resolved and len(ids) == 1:
+                resolved[name] = ids.pop()
+    return resolved
+
+
+def fill_structured_fields(entries):
+    """
+    Set action, target_type, target_name and actor on unsaved Logs instances
+    that don't have them yet, parsing info1. Values the client sent win.
+    """
+    pending = []
+    for entry in entries:
+        if entry.action:
+            continue
+        actor, entry.action, target_type, target_name = parse_message(entry.info1)
+        entry.target_type = entry.target_type or target_type
+        entry.target_name = entry.target_name or target_name
+        if entry.actor_id is None:
+            pending.append((entry, actor))
+    actors = resolve_actors(actor for _, actor in pending)
+    for entry, actor in pending:
+        entry.actor_id = actors.get(actor)
+        if entry.target_type == 'user' and entry.target_id is None:
+            entry.target_id = entry.actor_id
+    return entries
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.log_archive import archive_logs
+from api.models import Logs
+
+
+class Command(BaseCommand):
+    help = (
+        "Move log rows older than the retention age into compressed daily "
+        "archive files under LOG_ARCHIVE_DIR and delete them from the table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.LOG_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report how many rows would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        if options['dry_run']:
+            count = Logs.objects.filter(log_date__lt=cutoff).count()
+            self.stdout.write(f"{count} log row(s) older than {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        count = archive_logs(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {count} log row(s) older than {cutoff:%Y-%m-%d}."))
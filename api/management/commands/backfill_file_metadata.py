@@ -0,0 +1,53 @@
+import mimetypes
+
+from django.core.management.base import BaseCommand
+
+from api.folder_stats import recompute
+from api.models import Folder_Files
+
+
+class Command(BaseCommand):
+    help = "Fill in size_bytes and content_type for files uploaded before they were stored on the row."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Re-read every file, not only rows that have no size recorded yet.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        files = Folder_Files.objects.exclude(file='').exclude(file__isnull=True)
+        if not options['all']:
+            files = files.filter(size_bytes=0)
+
+        batch = []
+        folder_ids = set()
+        updated = missing = 0
+        for f in files.only('id', 'folder', 'file', 'size_bytes', 'content_type').iterator(chunk_size=batch_size):
+            try:
+                f.size_bytes = f.file.size
+            except (FileNotFoundError, OSError):
+                missing += 1
+                continue
+            f.content_type = f.content_type or mimetypes.guess_type(f.file.name)[0]
+            batch.append(f)
+            folder_ids.add(f.folder_id)
+            if len(batch) >= batch_size:
+                Folder_Files.objects.bulk_update(batch, ['size_bytes', 'content_type'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Folder_Files.objects.bulk_update(batch, ['size_bytes', 'content_type'])
+            updated += len(batch)
+
+        # FolderStats.total_bytes was summed from the sizes just filled in.
+        folder_ids.discard(None)
+        if folder_ids:
+            recompute(folder_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} file(s); refreshed the stats of {len(folder_ids)} folder(s)."))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} file(s) are missing from storage."))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from api.log_fields import fill_structured_fields
+from api.models import Logs
+
+
+class Command(BaseCommand):
+    help = "Fill in actor, action and target columns of log entries written before they existed, by parsing info1."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Re-parse every entry, not only rows that have no action yet.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        logs = Logs.objects.all()
+        if not options['all']:
+            logs = logs.filter(action='')
+
+        columns = ['actor', 'action', 'target_type', 'target_id', 'target_name']
+        updated = unparsed = 0
+        batch = []
+        for entry in logs.only('id', 'info1', *columns).iterator(chunk_size=batch_size):
+            entry.action = ''
+            entry.actor_id = None
+            entry.target_type = entry.target_name = ''
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                unparsed += self.update(batch, columns)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            unparsed += self.update(batch, columns)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} log entr(ies)."))
+        if unparsed:
+            self.stdout.write(self.style.WARNING(f"{unparsed} entr(ies) did not match a known message and were marked 'other'."))
+
+    def update(self, batch, columns):
+        fill_structured_fields(batch)
+        Logs.objects.bulk_update(batch, columns)
+        return sum(1 for entry in batch if entry.action == 'other')
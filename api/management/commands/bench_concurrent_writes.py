@@ -0,0 +1,96 @@
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test import Client
+
+from api.models import Folders, Folder_Files, Logs
+
+BENCH_MARKER = 'bench_concurrent_writes'
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer LogsCreateView and FileUploadView from parallel threads and "
+        "report throughput, latency and 'database is locked' failures. With "
+        "--baseline the same load also runs on stock SQLite settings for "
+        "comparison. Creates and removes a temporary user, folder and files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Requests per thread.")
+        parser.add_argument('--baseline', action='store_true')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username=BENCH_MARKER)
+        folder = Folders.objects.create(name=BENCH_MARKER, created_by=user)
+        tuned = connections.settings['default']
+        runs = [('tuned', tuned)]
+        if options['baseline'] and connection.vendor == 'sqlite':
+            runs.insert(0, ('stock sqlite', {
+                **tuned, 'OPTIONS': {}, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}))
+        try:
+            for label, settings_dict in runs:
+                self.run_load(label, settings_dict, user, folder,
+                              options['threads'], options['requests'])
+        finally:
+            connections.settings['default'] = tuned
+            connection.close()
+            for f in Folder_Files.objects.filter(folder=folder):
+                f.file.delete(save=False)
+            Logs.objects.filter(info4=BENCH_MARKER).delete()
+            user.delete()
+
+    def run_load(self, label, settings_dict, user, folder, threads, per_thread):
+        connections.settings['default'] = settings_dict
+        if connection.vendor == 'sqlite' and not settings_dict.get('OPTIONS'):
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+        connection.close()
+
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(n):
+            client = Client()
+            for i in range(per_thread):
+                start = time.perf_counter()
+                try:
+                    if i % 2:
+                        response = client.post(
+                            f'/api/file/{folder.id}/upload/{user.id}/',
+                            {'file': SimpleUploadedFile(f'bench-{n}-{i}.pdf', b'%PDF-1.4 bench\n' * 64)})
+                    else:
+                        response = client.post('/api/upload-logs/', {
+                            'info1': f'{BENCH_MARKER} {n}-{i}', 'info4': BENCH_MARKER})
+                    failed = response.status_code >= 400 and f'HTTP {response.status_code}'
+                except OperationalError as exc:
+                    failed = str(exc)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if failed:
+                        errors.append(failed)
+            connections.close_all()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        locked = sum('locked' in e for e in errors)
+        self.stdout.write(
+            f"{label:>12}: {len(latencies) / wall:7.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:6.1f} ms, "
+            f"{len(errors)} failed ({locked} database is locked)")
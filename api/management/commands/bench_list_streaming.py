@@ -0,0 +1,80 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.models import Logs
+
+BENCH_MARKER = 'bench_list_streaming'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak RSS and latency of GET /api/logs/ built in memory "
+        "versus streamed with ?stream=1. Inserts --rows temporary log rows "
+        "and removes them afterwards; do not run against a live database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--run-mode', choices=['buffered', 'stream'],
+                            help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['run_mode']:
+            return self.run_mode(options['run_mode'])
+
+        rows = options['rows']
+        self.stdout.write(f"Inserting {rows} log rows...")
+        Logs.objects.bulk_create(
+            (Logs(info1=f"Benchmark user uploaded a file named \"file-{i}.pdf\"",
+                  info2='pdf', info3='1.00 MB', info4=BENCH_MARKER)
+             for i in range(rows)),
+            batch_size=2000,
+        )
+        try:
+            for mode in ['buffered', 'stream']:
+                # A fresh process per mode, so peak RSS is not shared.
+                output = subprocess.run(
+                    [sys.executable, sys.argv[0], 'bench_list_streaming', '--run-mode', mode],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                self.stdout.write(
+                    f"{mode:>8}: first byte {result['ttfb_ms']:8.1f} ms, "
+                    f"total {result['total_ms']:8.1f} ms, "
+                    f"{result['bytes'] / 1024 ** 2:7.1f} MB body, "
+                    f"peak RSS +{result['rss_delta_kb'] / 1024:7.1f} MB")
+        finally:
+            Logs.objects.filter(info4=BENCH_MARKER).delete()
+
+    def run_mode(self, mode):
+        client = Client()
+        url = '/api/logs/?stream=1' if mode == 'stream' else '/api/logs/'
+        client.get('/api/logs/?paginate=cursor&page_size=1')  # warm up imports
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            chunks = iter(response.streaming_content)
+            first = next(chunks)
+            ttfb = time.perf_counter() - start
+            size = len(first) + sum(len(chunk) for chunk in chunks)
+        else:
+            ttfb = time.perf_counter() - start
+            size = len(response.content)
+        total = time.perf_counter() - start
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.stdout.write(json.dumps({
+            'ttfb_ms': ttfb * 1000,
+            'total_ms': total * 1000,
+            'bytes': size,
+            'rss_delta_kb': peak - baseline,
+        }))
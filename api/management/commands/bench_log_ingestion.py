@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api.log_buffer import log_buffer
+from api.models import Logs
+
+BENCH_MARKER = 'bench_log_ingestion'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare log ingestion throughput: one POST /api/upload-logs/ per "
+        "entry, batches to /api/upload-logs/bulk/, and the in-process "
+        "buffered writer. The inserted rows are removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        entries, batch_size = options['entries'], options['batch_size']
+        client = Client()
+
+        def entry(i):
+            return {'info1': f"Benchmark user opened file-{i}.pdf", 'info4': BENCH_MARKER}
+
+        def single():
+            for i in range(entries):
+                client.post('/api/upload-logs/', entry(i))
+
+        def batched():
+            for start in range(0, entries, batch_size):
+                client.post('/api/upload-logs/bulk/',
+                            [entry(i) for i in range(start, min(start + batch_size, entries))],
+                            content_type='application/json')
+
+        def buffered():
+            for i in range(entries):
+                log_buffer.write(**entry(i))
+            log_buffer.flush()
+
+        try:
+            for label, run in [('single', single), ('bulk', batched), ('buffered', buffered)]:
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                stored = Logs.objects.filter(info4=BENCH_MARKER).count()
+                Logs.objects.filter(info4=BENCH_MARKER).delete()
+                self.stdout.write(
+                    f"{label:>8}: {entries / elapsed:9.1f} entries/s "
+                    f"({elapsed:.2f} s, {stored} stored)")
+        finally:
+            Logs.objects.filter(info4=BENCH_MARKER).delete()
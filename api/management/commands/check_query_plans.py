@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.query_plans import LISTINGS, explain_listing, plan_problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN QUERY PLAN on the queryset of each list view and fail if "
+        "any of them falls back to a full table scan or a full sort. SQLite only. "
+        "The same checks run in api.tests.QueryPlanTests."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("check_query_plans reads SQLite query plans.")
+
+        failures = []
+        for view_class, kwargs, index in LISTINGS:
+            plan = explain_listing(view_class, kwargs)
+            problems = plan_problems(view_class, plan, index)
+            if problems:
+                failures.append(view_class.__name__)
+                self.stdout.write(self.style.ERROR(
+                    f"{view_class.__name__}: {', '.join(problems)}"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(f"{view_class.__name__}: ok")
+
+        if failures:
+            raise CommandError(f"{len(failures)} listing(s) have a regressed query plan.")
+        self.stdout.write(self.style.SUCCESS("All listings use an index."))
@@ -0,0 +1,74 @@
+import os
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from api.models import Blob, Folder_Files
+from api.storage import ContentAddressedStorage, is_blob
+from api.thumbnails import delete_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Move files stored before content-addressed storage into blobs, so "
+        "identical uploads share one copy. --recount rebuilds Blob reference "
+        "counts from the rows that use them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = Folder_Files._meta.get_field('file').storage
+        if not isinstance(storage, ContentAddressedStorage):
+            self.stdout.write(self.style.ERROR("Folder_Files does not use ContentAddressedStorage."))
+            return
+        if options['recount']:
+            self.recount()
+            return
+
+        rows = defaultdict(list)
+        for file_id, name in (Folder_Files.objects.exclude(file='').exclude(file__isnull=True)
+                              .values_list('id', 'file')):
+            if not is_blob(name):
+                rows[name].append(file_id)
+
+        moved = missing = 0
+        blobs_before = Blob.objects.count()
+        for name, ids in rows.items():
+            if not storage.exists(name):
+                missing += 1
+                continue
+            with transaction.atomic():
+                blob = storage.adopt(name, references=len(ids))
+                Folder_Files.objects.filter(id__in=ids).update(file=blob)
+            os.remove(storage.path(name))
+            for file_id in ids:
+                delete_derivatives(file_id, name)  # re-rendered under the new name on demand
+            moved += len(ids)
+
+        created = Blob.objects.count() - blobs_before
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} file(s) into {created} new blob(s); "
+            f"{moved - created} duplicate copies were dropped."))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} file(s) are missing from storage."))
+
+    def recount(self):
+        counts = dict(Folder_Files.objects.filter(file__startswith='blobs/')
+                      .values('file').annotate(n=Count('id')).values_list('file', 'n'))
+        storage = Folder_Files._meta.get_field('file').storage
+        changed = removed = 0
+        for blob in Blob.objects.all().iterator():
+            count = counts.get(blob.path, 0)
+            if count == 0:
+                Blob.objects.filter(id=blob.id).update(ref_count=1)
+                storage.delete(blob.path)  # drops the last reference and the file
+                removed += 1
+            elif blob.ref_count != count:
+                Blob.objects.filter(id=blob.id).update(ref_count=count)
+                changed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Corrected {changed} reference count(s); removed {removed} unused blob(s)."))
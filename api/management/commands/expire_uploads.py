@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.uploads import expire
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions idle for longer than UPLOAD_SESSION_TTL, and their staging files."
+
+    def handle(self, *args, **options):
+        count = expire()
+        self.stdout.write(self.style.SUCCESS(f"Expired {count} upload session(s)."))
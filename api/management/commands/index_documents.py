@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.models import DocumentText, Folder_Files
+from api.search import index_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract text for search from files that have not been indexed yet, "
+        "e.g. uploads from before search existed or lost to a restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Also retry files whose extraction failed.")
+        parser.add_argument('--all', action='store_true', help="Re-extract every file.")
+
+    def handle(self, *args, **options):
+        files = Folder_Files.objects.exclude(file='').exclude(file__isnull=True)
+        if not options['all']:
+            missing = Q(document_text__isnull=True)
+            if options['retry_failed']:
+                missing |= Q(document_text__status=DocumentText.FAILED)
+            files = files.filter(missing)
+
+        count = 0
+        for file_id in files.values_list('id', flat=True).iterator():
+            index_file(file_id)
+            count += 1
+            if count % 100 == 0:
+                self.stdout.write(f"Indexed {count} file(s)...")
+
+        failed = DocumentText.objects.filter(status=DocumentText.FAILED).count()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} file(s); {failed} failed in total."))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.purge import purge_batch
+
+
+class Command(BaseCommand):
+    help = "Delete the stored files of deleted folders, users and files in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Deletions in flight at once.")
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the queue instead of exiting when it is empty.")
+        parser.add_argument('--sleep', type=float, default=10,
+                            help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            purged, failed = purge_batch(
+                options['batch_size'], options['workers'], options['max_attempts'])
+            total += purged
+            if purged or failed:
+                self.stdout.write(f"Purged {purged} file(s), {failed} failed.")
+            if purged + failed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} file(s) in total."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from api.folder_stats import COUNTERS, recompute
+from api.models import FolderStats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-folder file counters from the Folder_Files table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder_ids', nargs='*', type=int,
+                            help="Only rebuild these folders (default: all).")
+
+    def handle(self, *args, **options):
+        folder_ids = options['folder_ids'] or None
+        previous = FolderStats.objects.all()
+        if folder_ids is not None:
+            previous = previous.filter(folder_id__in=folder_ids)
+        previous = {
+            row['folder_id']: row
+            for row in previous.values('folder_id', *COUNTERS)
+        }
+
+        stats = recompute(folder_ids)
+        drifted = 0
+        for s in stats:
+            old = previous.get(s.folder_id)
+            if old is None or any(old[key] != getattr(s, key) for key in COUNTERS):
+                drifted += 1
+                self.stdout.write(f"Folder {s.folder_id}: repaired")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recomputed {len(stats)} folder(s), {drifted} had drifted."))
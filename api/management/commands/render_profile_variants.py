@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.avatars import render_variants
+from api.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Render the resized JPEG/WebP variants of profile pictures that don't have current ones yet."
+
+    def handle(self, *args, **options):
+        profile_ids = (Profile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+                       .values_list('id', flat=True))
+        rendered = failed = 0
+        for profile_id in profile_ids.iterator():
+            try:
+                rendered += render_variants(profile_id)
+            except OSError as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"profile {profile_id}: {e}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered variants for {rendered} profile(s)."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} picture(s) could not be read."))
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.models import Folder_Files
+from api.thumbnails import render_derivatives
+
+
+def _render(file_id):
+    try:
+        return len(render_derivatives(file_id)), None
+    except Exception as e:
+        return 0, f"file {file_id}: {e}"
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Render the missing thumbnails and previews of image and PDF files uploaded before they were generated."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        file_ids = list(Folder_Files.objects.exclude(file='').exclude(file__isnull=True)
+                        .values_list('id', flat=True))
+        written = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for count, error in executor.map(_render, file_ids):
+                written += count
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(error))
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {written} derivative(s)."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} file(s) could not be rendered."))
@@ -0,0 +1,145 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, DateField, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from api.models import Folder_Files, StorageUsageRollup
+
+SUMS = {
+    'file_count': Count('id'),
+    'bytes_uploaded': Sum('size_bytes'),
+    'confidential_count': Count('id', filter=Q(is_confidential=True)),
+    'confidential_bytes': Sum('size_bytes', filter=Q(is_confidential=True)),
+    'archive_count': Count('id', filter=Q(is_archive=True)),
+    'archive_bytes': Sum('size_bytes', filter=Q(is_archive=True)),
+    'backup_count': Count('id', filter=Q(is_backup=True)),
+    'backup_bytes': Sum('size_bytes', filter=Q(is_backup=True)),
+}
+
+
+def bucket_start(granularity, day):
+    return day.replace(day=1) if granularity == StorageUsageRollup.MONTH else day
+
+
+def bucket_range(granularity, bucket):
+    """[start, end) datetimes of the files that fall in a bucket."""
+    if granularity == StorageUsageRollup.MONTH:
+        end = date(bucket.year + bucket.month // 12, bucket.month % 12 + 1, 1)
+    else:
+        end = bucket + timedelta(days=1)
+    return [timezone.make_aware(datetime.combine(day, time.min)) for day in (bucket, end)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the storage usage rollups from Folder_Files.date_creation. "
+        "By default the most recent bucket onwards is rebuilt, plus the older "
+        "buckets whose files changed since the last run: those holding files "
+        "updated since (archive, backup, move) and those that lost files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Rebuild every bucket.")
+        parser.add_argument('--since', help="Rebuild buckets from this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        since = None
+        stale = set()
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+        elif not options['full']:
+            since = (StorageUsageRollup.objects.filter(granularity=StorageUsageRollup.DAY)
+                     .order_by('-bucket').values_list('bucket', flat=True).first())
+            if since is not None:
+                stale = self.stale_days(since)
+
+        with transaction.atomic():
+            for granularity, trunc in [
+                (StorageUsageRollup.DAY, TruncDate('date_creation')),
+                (StorageUsageRollup.MONTH, TruncMonth('date_creation', output_field=DateField())),
+            ]:
+                start = since and bucket_start(granularity, since)
+                count = self.rebuild(granularity, trunc, start=start)
+                buckets = {bucket_start(granularity, day) for day in stale} - {start}
+                if buckets:
+                    count += self.rebuild(granularity, trunc, buckets=buckets)
+                self.stdout.write(f"{granularity}: {count} row(s) written")
+            # The next run picks up files changed after this one started.
+            StorageUsageRollup.objects.filter(updated_at__gte=started).update(updated_at=started)
+
+        if since is None:
+            self.stdout.write(self.style.SUCCESS("Rebuilt all buckets."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt buckets from {since} and {len(stale)} older day(s) that changed."))
+
+    def stale_days(self, since):
+        """
+        Days before `since` whose rollups no longer match their files.
+        Files keep their date_creation, so an older day only changes when
+        one of its files is updated (updated_at after the last run) or
+        deleted (its file count drops).
+        """
+        day_rollups = StorageUsageRollup.objects.filter(
+            granularity=StorageUsageRollup.DAY, bucket__lt=since)
+        older = Folder_Files.objects.filter(date_creation__lt=bucket_range(StorageUsageRollup.DAY, since)[0])
+        last_run = day_rollups.aggregate(last_run=Max('updated_at'))['last_run']
+        if last_run is None:
+            return set(older.annotate(day=TruncDate('date_creation'))
+                       .values_list('day', flat=True).distinct().order_by())
+
+        stale = set(older.filter(updated_at__gt=last_run)
+                    .annotate(day=TruncDate('date_creation'))
+                    .values_list('day', flat=True).distinct().order_by())
+
+        # Deletions leave nothing behind to find them by, but they show up
+        # as a lower file count. Compare the totals first and only count per
+        # day when they differ.
+        stored = day_rollups.aggregate(n=Sum('file_count'))['n'] or 0
+        if older.count() != stored:
+            live = dict(older.annotate(day=TruncDate('date_creation')).values('day')
+                        .annotate(n=Count('id')).order_by().values_list('day', 'n'))
+            counted = dict(day_rollups.values('bucket').annotate(n=Sum('file_count'))
+                           .order_by().values_list('bucket', 'n'))
+            stale.update(day for day in live.keys() | counted.keys()
+                         if live.get(day, 0) != counted.get(day, 0))
+        return stale
+
+    def rebuild(self, granularity, trunc, start=None, buckets=None):
+        """Rewrite the rollups from `start` onwards, or of the given `buckets`."""
+        rollups = StorageUsageRollup.objects.filter(granularity=granularity)
+        files = Folder_Files.objects.all()
+        if start is not None:
+            rollups = rollups.filter(bucket__gte=start)
+            files = files.filter(date_creation__gte=bucket_range(granularity, start)[0])
+        if buckets is not None:
+            rollups = rollups.filter(bucket__in=buckets)
+            ranges = Q()
+            for bucket in buckets:
+                low, high = bucket_range(granularity, bucket)
+                ranges |= Q(date_creation__gte=low, date_creation__lt=high)
+            files = files.filter(ranges)
+        rollups.delete()
+
+        rows = (files.annotate(bucket=trunc)
+                .values('bucket', 'uploaded_by_id', 'folder_id')
+                .annotate(**SUMS)
+                .order_by())
+        return len(StorageUsageRollup.objects.bulk_create([
+            StorageUsageRollup(
+                granularity=granularity,
+                bucket=row['bucket'],
+                user_id=row['uploaded_by_id'],
+                folder_id=row['folder_id'],
+                **{key: row[key] or 0 for key in SUMS},
+            )
+            for row in rows
+        ], batch_size=500))
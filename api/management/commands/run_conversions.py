@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api.conversion import requeue_stale, run_job
+from api.models import ConversionJob
+
+
+def _run(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued PDF conversions, including jobs left behind by a restart "
+        "of the web process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.CONVERSION_WORKERS)
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling the queue instead of exiting when it is empty.")
+        parser.add_argument('--sleep', type=float, default=10,
+                            help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} stale job(s).")
+                job_ids = list(ConversionJob.objects.filter(status=ConversionJob.QUEUED)
+                               .order_by('created_at').values_list('id', flat=True))
+                list(executor.map(_run, job_ids))
+                total += len(job_ids)
+                if not job_ids:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} conversion(s)."))
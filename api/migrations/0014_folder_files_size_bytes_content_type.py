@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_folder_files_is_backup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder_files',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='folder_files',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
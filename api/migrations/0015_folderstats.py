@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def populate_folder_stats(apps, schema_editor):
+    Folders = apps.get_model('api', 'Folders')
+    FolderStats = apps.get_model('api', 'FolderStats')
+    not_archived = Q(folder_files__is_archive=False)
+    folders = Folders.objects.annotate(
+        stat_file_count=Count('folder_files', filter=not_archived),
+        stat_archived_count=Count('folder_files', filter=Q(folder_files__is_archive=True)),
+        stat_backup_count=Count('folder_files', filter=Q(folder_files__is_backup=True)),
+        stat_total_bytes=Sum('folder_files__size_bytes', filter=not_archived),
+        stat_last_upload_at=Max('folder_files__date_creation'),
+    )
+    FolderStats.objects.bulk_create([
+        FolderStats(
+            folder_id=folder.id,
+            file_count=folder.stat_file_count,
+            archived_count=folder.stat_archived_count,
+            backup_count=folder.stat_backup_count,
+            total_bytes=folder.stat_total_bytes or 0,
+            last_upload_at=folder.stat_last_upload_at,
+        )
+        for folder in folders
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_folder_files_size_bytes_content_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FolderStats',
+            fields=[
+                ('folder', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.folders')),
+                ('file_count', models.BigIntegerField(default=0)),
+                ('archived_count', models.BigIntegerField(default=0)),
+                ('backup_count', models.BigIntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('last_upload_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(populate_folder_stats, migrations.RunPython.noop),
+    ]
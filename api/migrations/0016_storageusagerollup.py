@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_folderstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField()),
+                ('file_count', models.BigIntegerField(default=0)),
+                ('bytes_uploaded', models.BigIntegerField(default=0)),
+                ('confidential_count', models.BigIntegerField(default=0)),
+                ('confidential_bytes', models.BigIntegerField(default=0)),
+                ('archive_count', models.BigIntegerField(default=0)),
+                ('archive_bytes', models.BigIntegerField(default=0)),
+                ('backup_count', models.BigIntegerField(default=0)),
+                ('backup_bytes', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('folder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.folders')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='api_rollup_gran_bucket_idx')],
+            },
+        ),
+    ]
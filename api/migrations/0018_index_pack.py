@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_folders_updated_at_folder_files_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(condition=models.Q(('is_archive', False), ('is_backup', False)), fields=['folder', 'date_creation', 'id'], name='api_ff_folder_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(fields=['date_creation', 'id'], name='api_ff_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(condition=models.Q(('is_archive', False), ('is_confidential', False)), fields=['date_creation', 'id'], name='api_ff_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(condition=models.Q(('is_confidential', True)), fields=['date_creation', 'id'], name='api_ff_confidential_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(condition=models.Q(('is_archive', True)), fields=['date_creation', 'id'], name='api_ff_archive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder_files',
+            index=models.Index(condition=models.Q(('is_backup', True)), fields=['date_creation', 'id'], name='api_ff_backup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folders',
+            index=models.Index(fields=['date_creation', 'id'], name='api_folders_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logs',
+            index=models.Index(fields=['log_date', 'id'], name='api_logs_date_idx'),
+        ),
+    ]
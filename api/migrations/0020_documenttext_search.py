@@ -0,0 +1,106 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:01
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite keeps the index in an FTS5 table whose rowid is the Folder_Files id.
+# Triggers copy file and folder names on every insert, update and delete
+# (including cascades and bulk operations) and the extracted text whenever a
+# DocumentText row is written. The SQL is kept here rather than imported so
+# that this migration doesn't change with the app code.
+SQLITE_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS api_file_search USING fts5(
+    file_name, folder_name, content,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_ai AFTER INSERT ON api_folder_files BEGIN
+        INSERT INTO api_file_search (rowid, file_name, folder_name, content)
+        VALUES (new.id, coalesce(new.file_name, ''),
+                coalesce((SELECT name FROM api_folders WHERE id = new.folder_id), ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_ad AFTER DELETE ON api_folder_files BEGIN
+        DELETE FROM api_file_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_au AFTER UPDATE OF file_name, folder_id ON api_folder_files BEGIN
+        UPDATE api_file_search
+        SET file_name = coalesce(new.file_name, ''),
+            folder_name = coalesce((SELECT name FROM api_folders WHERE id = new.folder_id), '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_folder_au AFTER UPDATE OF name ON api_folders BEGIN
+        UPDATE api_file_search SET folder_name = new.name
+        WHERE rowid IN (SELECT id FROM api_folder_files WHERE folder_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_text_ai AFTER INSERT ON api_documenttext BEGIN
+        UPDATE api_file_search SET content = new.content WHERE rowid = new.file_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_file_search_text_au AFTER UPDATE OF content ON api_documenttext BEGIN
+        UPDATE api_file_search SET content = new.content WHERE rowid = new.file_id;
+    END
+    """,
+]
+
+SQLITE_REBUILD = """
+INSERT INTO api_file_search (rowid, file_name, folder_name, content)
+SELECT f.id, coalesce(f.file_name, ''), coalesce(d.name, ''), coalesce(t.content, '')
+FROM api_folder_files f
+LEFT JOIN api_folders d ON d.id = f.folder_id
+LEFT JOIN api_documenttext t ON t.file_id = f.id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """Create the FTS5 table and its triggers and index the existing rows."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(SQLITE_TABLE)
+    for trigger in SQLITE_TRIGGERS:
+        schema_editor.execute(trigger)
+    schema_editor.execute("DELETE FROM api_file_search")
+    schema_editor.execute(SQLITE_REBUILD)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in re.findall(r'EXISTS (\w+)', ' '.join(SQLITE_TRIGGERS)):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute("DROP TABLE IF EXISTS api_file_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_storagepurge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document_text', serialize=False, to='api.folder_files')),
+                ('content', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('done', 'Done'), ('unsupported', 'Unsupported'), ('failed', 'Failed')], max_length=12)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('extracted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_documenttext_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logs',
+            name='action',
+            field=models.CharField(blank=True, choices=[('login', 'Login'), ('upload', 'Upload'), ('create', 'Create'), ('rename', 'Rename'), ('archive', 'Archive'), ('restore', 'Restore'), ('delete', 'Delete'), ('delete_permanent', 'Delete permanently'), ('other', 'Other')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='logs',
+            name='actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='logs',
+            name='target_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='logs',
+            name='target_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='logs',
+            name='target_type',
+            field=models.CharField(blank=True, choices=[('user', 'User'), ('folder', 'Folder'), ('file', 'File')], default='', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='logs',
+            index=models.Index(fields=['actor', 'log_date', 'id'], name='api_logs_actor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logs',
+            index=models.Index(fields=['action', 'log_date', 'id'], name='api_logs_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logs',
+            index=models.Index(fields=['target_type', 'target_id'], name='api_logs_target_idx'),
+        ),
+    ]
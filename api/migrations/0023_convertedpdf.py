@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_conversionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConvertedPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('path', models.CharField(max_length=500)),
+                ('size_bytes', models.PositiveBigIntegerField(default=0)),
+                ('converter', models.CharField(blank=True, default='', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversionjob',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='conversionjob',
+            name='source_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='conversionjob',
+            index=models.Index(fields=['source_sha256', 'status'], name='api_convjob_sha_idx'),
+        ),
+    ]
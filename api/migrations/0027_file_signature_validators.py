@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:18
+
+import api.upload_handlers
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_blob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='folder_files',
+            name='file',
+            field=models.FileField(blank=True, null=True, upload_to='files/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png', 'docx', 'pdf', 'ppt', 'xls']), api.upload_handlers.validate_file_signature]),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, upload_to='profile_pictures/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']), api.upload_handlers.validate_file_signature]),
+        ),
+    ]
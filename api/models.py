@@ -1,7 +1,12 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
 
+from .upload_handlers import content_type_of, validate_file_signature
+
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -12,8 +17,11 @@ class Profile(models.Model):
         blank=True,
         null=True,
         validators=[FileExtensionValidator(
-            allowed_extensions=['jpg', 'jpeg', 'png'])]
+            allowed_extensions=['jpg', 'jpeg', 'png']), validate_file_signature]
     )
+    # Resized copies of profile_picture written by avatars.py:
+    # {"version": ..., "sizes": {"small": {"jpeg": name, "webp": name}, ...}}
+    picture_variants = models.JSONField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -29,6 +37,13 @@ class Folders(models.Model):
     name = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     date_creation = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_creation', 'id'],
+                         name='api_folders_created_idx'),
+        ]
 
 
 class Folder_Files(models.Model):
@@ -42,19 +57,220 @@ class Folder_Files(models.Model):
         validators=[FileExtensionValidator(
             allowed_extensions=['jpg', 'jpeg',
                                 'png', 'docx', 'pdf', 'ppt', 'xls']
-        )]
+        ), validate_file_signature]
     )
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
     date_creation = models.DateTimeField(auto_now_add=True)
     is_confidential = models.BooleanField(default=False)
     is_archive = models.BooleanField(default=False)
     is_backup = models.BooleanField(default=False)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=255, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # One index per hot filter in api/views.py; `manage.py
+        # check_query_plans` fails if a listing stops using them.
+        indexes = [
+            models.Index(fields=['folder', 'date_creation', 'id'],
+                         condition=models.Q(is_archive=False, is_backup=False),
+                         name='api_ff_folder_active_idx'),
+            models.Index(fields=['date_creation', 'id'],
+                         name='api_ff_created_idx'),
+            models.Index(fields=['date_creation', 'id'],
+                         condition=models.Q(is_archive=False, is_confidential=False),
+                         name='api_ff_recent_idx'),
+            models.Index(fields=['date_creation', 'id'],
+                         condition=models.Q(is_confidential=True),
+                         name='api_ff_confidential_idx'),
+            models.Index(fields=['date_creation', 'id'],
+                         condition=models.Q(is_archive=True),
+                         name='api_ff_archive_idx'),
+            models.Index(fields=['date_creation', 'id'],
+                         condition=models.Q(is_backup=True),
+                         name='api_ff_backup_idx'),
+        ]
 
+    def save(self, *args, **kwargs):
+        # Record size and type while the upload is still in hand, so listings
+        # and totals never have to stat() the file on disk.
+        if self.file and not self.file._committed:
+            self.size_bytes = self.file.size
+            self.content_type = content_type_of(self.file.file)
+        super().save(*args, **kwargs)
 
 
 class Logs(models.Model):
+    ACTION_CHOICES = [
+        ('login', 'Login'),
+        ('upload', 'Upload'),
+        ('create', 'Create'),
+        ('rename', 'Rename'),
+        ('archive', 'Archive'),
+        ('restore', 'Restore'),
+        ('delete', 'Delete'),
+        ('delete_permanent', 'Delete permanently'),
+        ('other', 'Other'),
+    ]
+    TARGET_TYPE_CHOICES = [
+        ('user', 'User'),
+        ('folder', 'Folder'),
+        ('file', 'File'),
+    ]
+
     info1 = models.TextField(blank=True, null=True)
     info2 = models.TextField(blank=True, null=True)
     info3 = models.TextField(blank=True, null=True)
     info4 = models.TextField(blank=True, null=True)
-    log_date = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    log_date = models.DateTimeField(auto_now_add=True)
+    # Parsed from info1 when the client doesn't send them (see log_fields.py)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='logs')
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES, blank=True, default='')
+    target_type = models.CharField(max_length=20, choices=TARGET_TYPE_CHOICES, blank=True, default='')
+    target_id = models.PositiveIntegerField(blank=True, null=True)
+    target_name = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['log_date', 'id'], name='api_logs_date_idx'),
+            models.Index(fields=['actor', 'log_date', 'id'], name='api_logs_actor_idx'),
+            models.Index(fields=['action', 'log_date', 'id'], name='api_logs_action_idx'),
+            models.Index(fields=['target_type', 'target_id'], name='api_logs_target_idx'),
+        ]
+
+class FolderStats(models.Model):
+    # Counters are maintained by the views that change Folder_Files rows;
+    # `manage.py recompute_folder_stats` rebuilds them from scratch.
+    folder = models.OneToOneField(
+        Folders, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    file_count = models.BigIntegerField(default=0)  # files not archived
+    archived_count = models.BigIntegerField(default=0)
+    backup_count = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)  # size of files not archived
+    last_upload_at = models.DateTimeField(blank=True, null=True)
+
+
+class StorageUsageRollup(models.Model):
+    # Filled by `manage.py rollup_storage_usage`; one row per bucket, uploader
+    # and folder (folder is empty for confidential uploads).
+    DAY = 'day'
+    MONTH = 'month'
+    GRANULARITY_CHOICES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    bucket = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    folder = models.ForeignKey(
+        Folders, on_delete=models.CASCADE, blank=True, null=True)
+    file_count = models.BigIntegerField(default=0)
+    bytes_uploaded = models.BigIntegerField(default=0)
+    confidential_count = models.BigIntegerField(default=0)
+    confidential_bytes = models.BigIntegerField(default=0)
+    archive_count = models.BigIntegerField(default=0)
+    archive_bytes = models.BigIntegerField(default=0)
+    backup_count = models.BigIntegerField(default=0)
+    backup_bytes = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['granularity', 'bucket'],
+                         name='api_rollup_gran_bucket_idx'),
+        ]
+
+
+class StoragePurge(models.Model):
+    # Stored files whose rows are gone, waiting for `manage.py purge_storage`.
+    path = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    reason = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+
+class DocumentText(models.Model):
+    # Text extracted from an uploaded document for full-text search.
+    DONE = 'done'
+    UNSUPPORTED = 'unsupported'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(DONE, 'Done'), (UNSUPPORTED, 'Unsupported'), (FAILED, 'Failed')]
+
+    file = models.OneToOneField(
+        Folder_Files, on_delete=models.CASCADE, primary_key=True,
+        related_name='document_text')
+    content = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True, null=True)
+    extracted_at = models.DateTimeField(blank=True, null=True)
+
+
+class ConversionJob(models.Model):
+    # Queued by POST /api/convert-to-pdf/ and run on the conversion pool;
+    # `manage.py run_conversions` picks up jobs a restart left behind.
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    source = models.CharField(max_length=500)  # path relative to MEDIA_ROOT
+    source_sha256 = models.CharField(max_length=64, blank=True, default='')
+    cache_hit = models.BooleanField(default=False)  # answered from ConvertedPdf
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    output = models.CharField(max_length=500, blank=True, default='')  # relative to MEDIA_ROOT
+    converter = models.CharField(max_length=50, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='api_convjob_status_idx'),
+            models.Index(fields=['source', 'status'], name='api_convjob_source_idx'),
+            models.Index(fields=['source_sha256', 'status'], name='api_convjob_sha_idx'),
+        ]
+
+
+class ConvertedPdf(models.Model):
+    # Cache of conversion results: one PDF per source content and converter
+    # version, evicted least recently used first (see conversion.py).
+    key = models.CharField(max_length=100, unique=True)
+    path = models.CharField(max_length=500)  # relative to MEDIA_ROOT
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    converter = models.CharField(max_length=50, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class UploadSession(models.Model):
+    # A resumable upload in progress: chunks are appended to a staging file
+    # under UPLOAD_STAGING_DIR until finalize turns it into a Folder_Files row.
+    # `manage.py expire_uploads` removes sessions idle past UPLOAD_SESSION_TTL.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    folder = models.ForeignKey(Folders, on_delete=models.CASCADE, blank=True, null=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    is_confidential = models.BooleanField(default=False)
+    file = models.ForeignKey(Folder_Files, on_delete=models.SET_NULL, blank=True, null=True)  # set on finalize
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class Blob(models.Model):
+    # One stored copy of each distinct upload (see storage.py); ref_count is
+    # the number of saved references, and the file goes with the last one.
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255, unique=True)  # storage name
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
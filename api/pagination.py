@@ -0,0 +1,49 @@
+# pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset pagination that clients opt into with `?paginate=cursor` (or by
+    sending a `cursor`). Without it the view returns the whole list as
+    before, so existing clients keep working during the transition.
+
+    The cursor holds the position of the last row on the ordering column
+    plus an offset among rows that share it, so every page costs one
+    indexed range query no matter how deep it is.
+    """
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def is_requested(self, request):
+        return (request.query_params.get('paginate') == 'cursor'
+                or self.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class FileCursorPagination(OptInCursorPagination):
+    ordering = ('-date_creation', '-id')
+
+
+class FolderCursorPagination(OptInCursorPagination):
+    ordering = ('-date_creation', '-id')
+
+
+class LogCursorPagination(OptInCursorPagination):
+    ordering = ('-log_date', '-id')
+
+
+class LogQueryCursorPagination(LogCursorPagination):
+    # The log query endpoint always pages; the log table is unbounded.
+    def is_requested(self, request):
+        return True
+
+
+class ProfileCursorPagination(OptInCursorPagination):
+    ordering = ('-id',)
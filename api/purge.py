@@ -0,0 +1,86 @@
+# purge.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.db.models import F
+
+from .models import Folder_Files, StoragePurge
+from .thumbnails import derivative_names, source_kind
+from .avatars import variant_names
+
+
+def queue_file_purge(files, reason):
+    """Queue the stored files of a Folder_Files queryset, and their thumbnails, for deletion."""
+    rows = (files.exclude(file='').exclude(file__isnull=True)
+            .values_list('id', 'file', 'size_bytes', 'content_type'))
+    paths = []
+    for file_id, name, size, content_type in rows:
+        paths.append((name, size))
+        if source_kind(content_type, name):
+            paths.extend((derivative, 0) for derivative in derivative_names(file_id, name))
+    return queue_paths(paths, reason)
+
+
+def queue_profile_purge(profiles, reason):
+    """Queue the profile pictures of a Profile queryset, and their variants, for deletion."""
+    rows = (profiles.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('user_id', 'profile_picture'))
+    paths = []
+    for user_id, name in rows:
+        paths.append((name, 0))
+        paths.extend((variant, 0) for variant in variant_names(user_id, name))
+    return queue_paths(paths, reason)
+
+
+def queue_paths(paths, reason):
+    """Queue (storage path, size in bytes) pairs for deletion."""
+    return StoragePurge.objects.bulk_create(
+        [StoragePurge(path=path, size_bytes=size or 0, reason=reason[:100])
+         for path, size in paths],
+        batch_size=500,
+    )
+
+
+def _delete(storage, path):
+    try:
+        storage.delete(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def _delete_all(storage, purges):
+    # Runs in a worker thread. Deleting a blob updates its Blob row through
+    # the thread's own connection, which must be closed before it exits.
+    try:
+        return [(purge, _delete(storage, purge.path)) for purge in purges]
+    finally:
+        connection.close()
+
+
+def purge_batch(batch_size=500, workers=4, max_attempts=5):
+    """
+    Delete up to `batch_size` queued files with at most `workers` deletions
+    in flight. Returns (purged, failed); failures stay queued with their
+    error until they run out of attempts.
+    """
+    storage = Folder_Files._meta.get_field('file').storage
+    batch = list(StoragePurge.objects.filter(attempts__lt=max_attempts)
+                 .order_by('id')[:batch_size])
+    if not batch:
+        return 0, 0
+
+    slices = [batch[i::workers] for i in range(min(workers, len(batch)))]
+    with ThreadPoolExecutor(max_workers=len(slices)) as pool:
+        results = [result for chunk in pool.map(lambda s: _delete_all(storage, s), slices)
+                   for result in chunk]
+
+    done = [p.id for p, error in results if error is None]
+    failed = [(p, error) for p, error in results if error is not None]
+    StoragePurge.objects.filter(id__in=done).delete()
+    for purge, error in failed:
+        StoragePurge.objects.filter(id=purge.id).update(
+            attempts=F('attempts') + 1, last_error=error)
+    return len(done), len(failed)
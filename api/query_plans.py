@@ -0,0 +1,54 @@
+# query_plans.py
+import re
+
+from django.test import RequestFactory
+
+from . import views
+
+# (view, URL kwargs, index the listing must use). Each listing is checked
+# the way it is served when paginated: ordered by its cursor columns with
+# a LIMIT.
+LISTINGS = [
+    (views.AllFilesView, {}, 'api_ff_created_idx'),
+    (views.FolderListView, {}, 'api_folders_created_idx'),
+    (views.FolderFilesListView, {'folder_id': 1}, 'api_ff_folder_active_idx'),
+    (views.FileArchiveListView, {}, 'api_ff_archive_idx'),
+    (views.FileBackupListView, {}, 'api_ff_backup_idx'),
+    (views.ConfidentialFileListView, {}, 'api_ff_confidential_idx'),
+    (views.RecentUploadFileView, {}, 'api_ff_recent_idx'),
+    (views.LogsListView, {}, 'api_logs_date_idx'),
+    (views.LogsQueryView, {}, 'api_logs_date_idx'),
+    # Profiles are filtered on auth_user flags, so the page is read by
+    # walking api_profile backwards by id until the LIMIT is reached.
+    (views.NonStaffUsersView, {}, None),
+]
+ALLOWED_SCANS = {views.NonStaffUsersView: {'api_profile'}}
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)\b(?! USING)')
+SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def explain_listing(view_class, kwargs):
+    """SQLite's EXPLAIN QUERY PLAN of a list view's paginated queryset."""
+    view = view_class()
+    view.request = view.initialize_request(RequestFactory().get('/'))
+    view.kwargs = kwargs
+    view.format_kwarg = None
+
+    queryset = view.get_queryset()
+    ordering = getattr(view.paginator, 'ordering', None)
+    if ordering and not queryset.query.is_sliced:
+        queryset = queryset.order_by(*ordering)[:view.paginator.page_size]
+    return queryset.explain()
+
+
+def plan_problems(view_class, plan, index):
+    """What is wrong with a listing's plan: full scans, full sorts, a missing index."""
+    allowed = ALLOWED_SCANS.get(view_class, set())
+    problems = [f"full scan of {table}" for table in FULL_SCAN.findall(plan)
+                if table not in allowed]
+    if SORT in plan:
+        problems.append("sorts the whole result")
+    if index is not None and index not in plan:
+        problems.append(f"does not use {index}")
+    return problems
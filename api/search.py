@@ -0,0 +1,157 @@
+# search.py
+import html
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import DocumentText, Folder_Files
+
+try:
+    import pypdf
+except ImportError:  # PDF text extraction is optional
+    pypdf = None
+
+MAX_CONTENT_CHARS = 1_000_000
+
+# SQLite keeps the index in an FTS5 table whose rowid is the Folder_Files id,
+# filled by triggers on api_folder_files, api_folders and api_documenttext
+# (created in migration 0020). Migrations that rebuild api_folder_files or
+# api_folders must create those triggers again.
+
+# highlight()/snippet() wrap matches in these; they become <mark> only after
+# the text around them has been escaped.
+MARK_START, MARK_END = '\ue000', '\ue001'
+
+
+def _marked_html(text):
+    if text is None:
+        return None
+    return html.escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _xml_text(data, tag):
+    root = ElementTree.fromstring(data)
+    return ' '.join(node.text for node in root.iter() if node.tag.endswith(tag) and node.text)
+
+
+def _extract_docx(path):
+    with zipfile.ZipFile(path) as z:
+        return _xml_text(z.read('word/document.xml'), '}t')
+
+
+def _extract_pptx(path):
+    with zipfile.ZipFile(path) as z:
+        slides = sorted(n for n in z.namelist() if re.match(r'ppt/slides/slide\d+\.xml$', n))
+        return '\n'.join(_xml_text(z.read(n), '}t') for n in slides)
+
+
+def _extract_pdf(path):
+    reader = pypdf.PdfReader(path)
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def _extract_legacy_office(path):
+    # Old binary .ppt/.xls files keep their text as UTF-16 runs; pull out the
+    # readable ones rather than parse the format.
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    runs = re.findall(rb'(?:[\x20-\x7e]\x00){4,}', data)
+    return '\n'.join(run.decode('utf-16-le') for run in runs)
+
+
+def extract_text(path):
+    """Return the text of a document, or None if its type is not indexed."""
+    ext = path.rsplit('.', 1)[-1].lower()
+    if ext == 'docx':
+        return _extract_docx(path)
+    if ext == 'pdf':
+        return _extract_pdf(path) if pypdf is not None else None
+    if ext in ('ppt', 'xls'):
+        if zipfile.is_zipfile(path):  # saved as .pptx under the old name
+            return _extract_pptx(path)
+        return _extract_legacy_office(path)
+    return None
+
+
+def index_file(file_id):
+    """Extract the text of one uploaded file into DocumentText."""
+    file = Folder_Files.objects.filter(id=file_id).only('id', 'file').first()
+    if file is None:
+        return
+    values = {'extracted_at': timezone.now(), 'error': None}
+    try:
+        text = extract_text(file.file.path) if file.file else None
+    except Exception as e:
+        values.update(status=DocumentText.FAILED, content='', error=str(e))
+    else:
+        if text is None:
+            values.update(status=DocumentText.UNSUPPORTED, content='')
+        else:
+            values.update(status=DocumentText.DONE, content=text[:MAX_CONTENT_CHARS])
+    DocumentText.objects.update_or_create(file_id=file_id, defaults=values)
+
+
+def to_match_query(text):
+    """Turn user input into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r'\w+', text)[:10]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_files(text, limit=20, include_archived=False):
+    """
+    Rank non-confidential files by how well their name, folder name and
+    content match `text`. Returns dicts with the file id, rank and
+    highlighted snippets, best match first.
+    """
+    query = to_match_query(text)
+    if not query:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(text, limit, include_archived)
+
+    archived = '' if include_archived else 'AND NOT f.is_archive'
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT f.id,
+                   bm25(api_file_search, 10.0, 4.0, 1.0) AS rank,
+                   highlight(api_file_search, 0, %s, %s) AS name_highlight,
+                   snippet(api_file_search, 2, %s, %s, '…', 16) AS snippet
+            FROM api_file_search
+            JOIN api_folder_files f ON f.id = api_file_search.rowid
+            WHERE api_file_search MATCH %s AND NOT f.is_confidential {archived}
+            ORDER BY rank
+            LIMIT %s
+        """, [MARK_START, MARK_END, MARK_START, MARK_END, query, limit])
+        return [
+            {'id': row[0], 'rank': -row[1], 'name_highlight': _marked_html(row[2]),
+             'snippet': _marked_html(row[3])}
+            for row in cursor.fetchall()
+        ]
+
+
+def _search_postgres(text, limit, include_archived):
+    from django.contrib.postgres.search import (
+        SearchHeadline, SearchQuery, SearchRank, SearchVector)
+
+    query = SearchQuery(' & '.join(f'{w}:*' for w in re.findall(r'\w+', text)[:10]),
+                        search_type='raw')
+    vector = (SearchVector('file_name', weight='A')
+              + SearchVector('folder__name', weight='B')
+              + SearchVector('document_text__content', weight='C'))
+    files = Folder_Files.objects.filter(is_confidential=False)
+    if not include_archived:
+        files = files.filter(is_archive=False)
+    files = (files.annotate(search=vector, rank=SearchRank(vector, query))
+             .filter(search=query)
+             .annotate(
+                 name_highlight=SearchHeadline('file_name', query, start_sel=MARK_START, stop_sel=MARK_END),
+                 snippet=SearchHeadline('document_text__content', query, start_sel=MARK_START,
+                                        stop_sel=MARK_END, max_words=16),
+             )
+             .order_by('-rank')
+             .values('id', 'rank', 'name_highlight', 'snippet')[:limit])
+    return [dict(row, name_highlight=_marked_html(row['name_highlight']),
+                 snippet=_marked_html(row['snippet'])) for row in files]
@@ -1,8 +1,91 @@
 # serializers.py
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Profile, Folders, Folder_Files, Logs
+from django.core.exceptions import FieldDoesNotExist
+from .models import Profile, Folders, Folder_Files, Logs, UploadSession
+from .folder_stats import stats_for_folder
+from .log_fields import fill_structured_fields
+from .thumbnails import source_kind, version
+from .avatars import render_variants
+from .background import run_in_background
+from .downloads import can_download, sign_download
+from django.urls import reverse
 from django.db import models
+from django.db.models import Sum
+from django.core.files import File
+from datetime import timedelta
+
+
+def sparse_params(request):
+    """Parse `?fields=a,b` and `?expand=c` of a GET into two sets of names."""
+    if request.method != 'GET':
+        return set(), set()
+
+    def names(param):
+        value = request.query_params.get(param, '')
+        return {name.strip() for name in value.split(',') if name.strip()}
+    return names('fields'), names('expand')
+
+
+class SparseFieldsMixin:
+    """
+    Lets a request pick its output with `?fields=` and `?expand=`.
+
+    Without `?fields=` the serializer renders as it always has. With it,
+    only the listed fields are rendered, and relations named in
+    Meta.expandable_fields render as their primary key unless they are also
+    listed in `?expand=`. Meta.field_sources names the model columns behind
+    computed fields so that sparse_queryset() can load just those columns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        fields, expand = sparse_params(request)
+        if not fields:
+            return
+        for name in list(self.fields):
+            if name not in fields:
+                self.fields.pop(name)
+        for name in getattr(self.Meta, 'expandable_fields', []):
+            if name in self.fields and name not in expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request, extra=()):
+        """Restrict `queryset` to the columns the requested fields need."""
+        fields, expand = sparse_params(request)
+        if not fields:
+            return queryset
+        model = cls.Meta.model
+        sources = getattr(cls.Meta, 'field_sources', {})
+        expandable = getattr(cls.Meta, 'expandable_fields', [])
+        columns = {model._meta.pk.name, *extra}
+        related = set()
+        for name in fields:
+            if name in sources:
+                columns.update(sources[name])
+            elif name in expandable:
+                columns.add(name)
+                if name in expand:
+                    related.add(name)
+                    nested = cls._declared_fields[name]
+                    columns.update(f'{name}__{f}' for f in nested.Meta.fields)
+            else:
+                try:
+                    field = model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    continue  # unknown or computed field
+                if field.concrete:
+                    columns.add(name)
+        related.update(c.rsplit('__', 1)[0] for c in columns if '__' in c)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -10,6 +93,16 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = '__all__'
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Compact, read-only user representation for nesting in listings."""
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'first_name', 'last_name',
+                  'is_staff', 'is_superuser']
+        read_only_fields = fields
+
+
 class UserDeleteSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -18,7 +111,11 @@ class UserDeleteSerializer(serializers.ModelSerializer):
 class RegisterSerializer(serializers.ModelSerializer):
     address = serializers.CharField(
         write_only=True, required=False, allow_blank=True)
-    profile_picture = serializers.ImageField(write_only=True, required=False)
+    # Declared here, so the model field's extension and content checks are
+    # passed on explicitly.
+    profile_picture = serializers.ImageField(
+        write_only=True, required=False,
+        validators=Profile._meta.get_field('profile_picture').validators)
 
     class Meta:
         model = User
@@ -43,51 +140,168 @@ class RegisterSerializer(serializers.ModelSerializer):
             last_name=validated_data.get('last_name', '')
         )
 
-        Profile.objects.create(
+        profile = Profile.objects.create(
             user=user,
             address=address,
             profile_picture=profile_picture
         )
+        if profile.profile_picture:
+            run_in_background(render_variants, profile.id)
 
         return user
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class SiteRelativeImageField(serializers.ImageField):
+    """
+    Renders the MEDIA_URL path without scheme and host when the context sets
+    `relative_media_urls`, as serializers built without a request do.
+    """
+
+    def to_representation(self, value):
+        if value and self.context.get('relative_media_urls'):
+            return value.url
+        return super().to_representation(value)
+
+
+class ProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping,
+                                models.ImageField: SiteRelativeImageField}
     id = serializers.IntegerField(source='user.id', read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    picture_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'address', 'status', 'profile_picture']
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'address', 'status',
+                  'profile_picture', 'picture_variants']
+        field_sources = {
+            'id': ['user__id'],
+            'username': ['user__username'],
+            'email': ['user__email'],
+            'first_name': ['user__first_name'],
+            'last_name': ['user__last_name'],
+            'picture_variants': ['picture_variants', 'profile_picture'],
+        }
+
+    def get_picture_variants(self, obj):
+        # {"small": {"jpeg": url, "webp": url}, "medium": ..., "large": ...};
+        # null until the variants of the current picture have been rendered.
+        variants = obj.picture_variants or {}
+        if not obj.profile_picture or variants.get('version') != version(obj.profile_picture.name):
+            return None
+        request = None if self.context.get('relative_media_urls') else self.context.get('request')
+        urls = {}
+        for size, formats in variants['sizes'].items():
+            urls[size] = {}
+            for fmt, name in formats.items():
+                url = settings.MEDIA_URL + name
+                urls[size][fmt] = request.build_absolute_uri(url) if request else url
+        return urls
 
 
 
 
-class FolderSerializer(serializers.ModelSerializer):
-    created_by = UserSerializer(read_only=True)
+class FolderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    created_by = UserSummarySerializer(read_only=True)
 
     class Meta:
         model = Folders
         fields = ['id', 'name', 'created_by', 'date_creation']
         read_only_fields = ['created_by', 'date_creation']
-
-
-class FolderFilesSerializer(serializers.ModelSerializer):
-    uploaded_by = UserSerializer(read_only=True)
+        expandable_fields = ['created_by']
+
+
+class ThumbnailUrlsMixin(serializers.Serializer):
+    """
+    thumbnail_url (256px) and preview_url (1024px) of image and PDF files,
+    null for other types. The URLs carry the stored file's version, so the
+    endpoint behind them can be cached by browsers for good. Confidential
+    files get signed URLs, as for download_url.
+    """
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+
+    def derivative_url(self, obj, size):
+        if not obj.file or source_kind(obj.content_type, obj.file.name) is None:
+            return None
+        url = f"{reverse('file-thumbnail', args=[obj.id, size])}?v={version(obj.file.name)}"
+        request = self.context.get('request')
+        if obj.is_confidential and request is not None and can_download(request.user, obj):
+            url += f"&signature={sign_download(obj.id)}"
+        return request.build_absolute_uri(url) if request else url
+
+    def get_thumbnail_url(self, obj):
+        return self.derivative_url(obj, 'small')
+
+    def get_preview_url(self, obj):
+        return self.derivative_url(obj, 'large')
+
+
+class StoredFileField(serializers.FileField):
+    """
+    Stored files are not published under MEDIA_URL (PROTECTED_MEDIA_PREFIXES),
+    so `file` renders the download endpoint instead, and nothing for
+    confidential files, whose only link is the permission-checked download_url.
+    """
+
+    def to_representation(self, value):
+        if not value or value.instance.is_confidential:
+            return None
+        url = reverse('file-download', args=[value.instance.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class StoredFileMixin:
+    """Renders the model's FileField with StoredFileField."""
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping,
+                                models.FileField: StoredFileField}
+
+
+class DownloadUrlMixin(serializers.Serializer):
+    """
+    download_url of the file's download endpoint. For a confidential file it
+    is signed when the requesting user may open it, so it also works as a
+    plain link for DOWNLOAD_URL_MAX_AGE seconds.
+    """
+    download_url = serializers.SerializerMethodField()
+
+    def get_download_url(self, obj):
+        if not obj.file:
+            return None
+        url = reverse('file-download', args=[obj.id])
+        request = self.context.get('request')
+        if obj.is_confidential and request is not None and can_download(request.user, obj):
+            url += f"?signature={sign_download(obj.id)}"
+        return request.build_absolute_uri(url) if request else url
+
+
+class FolderFilesSerializer(SparseFieldsMixin, StoredFileMixin, DownloadUrlMixin, ThumbnailUrlsMixin, serializers.ModelSerializer):
+    uploaded_by = UserSummarySerializer(read_only=True)
     file_size = serializers.SerializerMethodField()
 
     class Meta:
         model = Folder_Files
         fields = [f.name for f in Folder_Files._meta.fields] + \
-            ['uploaded_by', 'file_size', 'is_confidential', 'is_archive']
-        read_only_fields = ['uploaded_by', 'date_creation']
+            ['uploaded_by', 'file_size', 'is_confidential', 'is_archive',
+             'download_url', 'thumbnail_url', 'preview_url']
+        read_only_fields = ['uploaded_by', 'date_creation',
+                            'size_bytes', 'content_type']
+        expandable_fields = ['uploaded_by']
+        field_sources = {
+            'file': ['file', 'is_confidential'],
+            'file_size': ['file', 'size_bytes'],
+            'download_url': ['file', 'is_confidential', 'uploaded_by'],
+            'thumbnail_url': ['file', 'content_type', 'is_confidential', 'uploaded_by'],
+            'preview_url': ['file', 'content_type', 'is_confidential', 'uploaded_by'],
+        }
 
     def get_file_size(self, obj):
         if obj.file:
-            size = obj.file.size  # bytes
+            size = obj.size_bytes
             for unit in ['B', 'KB', 'MB', 'GB']:
                 if size < 1024:
                     return f"{size:.2f} {unit}"
@@ -110,7 +324,7 @@ class FolderTotalSizeSerializer(serializers.ModelSerializer):
                   'total_size_bytes', 'total_size_human']
 
     def get_total_size_bytes(self, obj):
-        return sum(f.file.size for f in Folder_Files.objects.filter(folder=obj).exclude(is_archive=True) if f.file)
+        return stats_for_folder(obj).total_bytes
 
     def get_total_size_human(self, obj):
         size = self.get_total_size_bytes(obj)
@@ -124,7 +338,7 @@ class FolderTotalSizeSerializer(serializers.ModelSerializer):
             return f"{size / (1024 ** 3):.2f} GB"
 
 
-class FileArchiveSerializer(serializers.ModelSerializer):
+class FileArchiveSerializer(StoredFileMixin, serializers.ModelSerializer):
     class Meta:
         model = Folder_Files
         fields = '__all__'
@@ -136,7 +350,7 @@ class FileArchiveSerializer(serializers.ModelSerializer):
         return instance
 
 
-class FileUnarchiveSerializer(serializers.ModelSerializer):
+class FileUnarchiveSerializer(StoredFileMixin, serializers.ModelSerializer):
     class Meta:
         model = Folder_Files
         fields = '__all__'
@@ -148,7 +362,7 @@ class FileUnarchiveSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ConfidentialFileSerializer(serializers.ModelSerializer):
+class ConfidentialFileSerializer(SparseFieldsMixin, StoredFileMixin, DownloadUrlMixin, ThumbnailUrlsMixin, serializers.ModelSerializer):
     file_size_bytes = serializers.SerializerMethodField()
     file_size_human = serializers.SerializerMethodField()
 
@@ -163,13 +377,24 @@ class ConfidentialFileSerializer(serializers.ModelSerializer):
             'date_creation',
             'file_size_bytes',
             'file_size_human',
+            'download_url',
+            'thumbnail_url',
+            'preview_url',
         ]
         read_only_fields = ['is_confidential', 'date_creation',
                             'file_size_bytes', 'file_size_human']
+        field_sources = {
+            'file': ['file', 'is_confidential'],
+            'file_size_bytes': ['file', 'size_bytes'],
+            'file_size_human': ['file', 'size_bytes'],
+            'download_url': ['file', 'is_confidential', 'uploaded_by'],
+            'thumbnail_url': ['file', 'content_type', 'is_confidential', 'uploaded_by'],
+            'preview_url': ['file', 'content_type', 'is_confidential', 'uploaded_by'],
+        }
 
     def get_file_size_bytes(self, obj):
         if obj.file:
-            return obj.file.size
+            return obj.size_bytes
         return 0
 
     def get_file_size_human(self, obj):
@@ -184,10 +409,42 @@ class ConfidentialFileSerializer(serializers.ModelSerializer):
             return f"{size / (1024 ** 3):.2f} GB"
 
 
-class LogsSerializer(serializers.ModelSerializer):
+class LogsBulkSerializer(serializers.ListSerializer):
+    """Creates many log entries with a single bulk_create."""
+
+    def create(self, validated_data):
+        entries = fill_structured_fields([Logs(**item) for item in validated_data])
+        return Logs.objects.bulk_create(entries, batch_size=500)
+
+
+class LogsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # The user id, as before, unless the request asks for ?expand=actor.
+    actor = UserSummarySerializer(read_only=True)
+
     class Meta:
         model = Logs
         fields = '__all__'
+        list_serializer_class = LogsBulkSerializer
+        expandable_fields = ['actor']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if 'actor' in self.fields and (request is None or 'actor' not in sparse_params(request)[1]):
+            self.fields['actor'] = serializers.PrimaryKeyRelatedField(
+                queryset=User.objects.all(), required=False, allow_null=True)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request, extra=()):
+        fields, expand = sparse_params(request)
+        if not fields and 'actor' in expand:
+            queryset = queryset.select_related('actor')
+        return super().sparse_queryset(queryset, request, extra)
+
+    def create(self, validated_data):
+        entry, = fill_structured_fields([Logs(**validated_data)])
+        entry.save()
+        return entry
 
 
 class FolderFilesTotalSizeSerializer(serializers.Serializer):
@@ -195,14 +452,10 @@ class FolderFilesTotalSizeSerializer(serializers.Serializer):
     total_size_human = serializers.SerializerMethodField()
 
     def get_total_size_bytes(self, obj):
-        total = 0
-        for f in Folder_Files.objects.all():
-            if f.file and hasattr(f.file, 'size'):
-                try:
-                    total += f.file.size
-                except Exception:
-                    pass  # skip files that can't be accessed
-        return total
+        if not hasattr(self, '_total_size_bytes'):
+            self._total_size_bytes = Folder_Files.objects.aggregate(
+                total=Sum('size_bytes'))['total'] or 0
+        return self._total_size_bytes
 
     def get_total_size_human(self, obj):
         size = self.get_total_size_bytes(obj)
@@ -213,13 +466,13 @@ class FolderFilesTotalSizeSerializer(serializers.Serializer):
         return f"{size:.2f} PB"
 
 
-class FileSerializer(serializers.ModelSerializer):
+class FileSerializer(StoredFileMixin, serializers.ModelSerializer):
     class Meta:
         model = Folder_Files
         fields = '__all__'
         
         
-class FileUbackupSerializer(serializers.ModelSerializer):
+class FileUbackupSerializer(StoredFileMixin, serializers.ModelSerializer):
     class Meta:
         model = Folder_Files
         fields = '__all__'
@@ -229,3 +482,91 @@ class FileUbackupSerializer(serializers.ModelSerializer):
         instance.is_backup = False
         instance.save()
         return instance
+
+
+class StorageUsageSerializer(serializers.Serializer):
+    bucket = serializers.DateField()
+    user_id = serializers.IntegerField(required=False)
+    username = serializers.CharField(source='user__username', required=False)
+    folder_id = serializers.IntegerField(required=False)
+    folder_name = serializers.CharField(source='folder__name', required=False)
+    file_count = serializers.IntegerField()
+    bytes_uploaded = serializers.IntegerField()
+    confidential_count = serializers.IntegerField()
+    confidential_bytes = serializers.IntegerField()
+    archive_count = serializers.IntegerField()
+    archive_bytes = serializers.IntegerField()
+    backup_count = serializers.IntegerField()
+    backup_bytes = serializers.IntegerField()
+
+
+class BulkFileFilterSerializer(serializers.Serializer):
+    folder = serializers.IntegerField(required=False)
+    uploaded_by = serializers.IntegerField(required=False)
+    is_confidential = serializers.BooleanField(required=False)
+    is_archive = serializers.BooleanField(required=False)
+    is_backup = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError("Give at least one filter field.")
+        return attrs
+
+
+class BulkFileActionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS)
+    filter = BulkFileFilterSerializer(required=False)
+    folder = serializers.PrimaryKeyRelatedField(
+        queryset=Folders.objects.all(), required=False)  # target of a move
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Send either 'ids' or 'filter'.")
+        return attrs
+
+
+class SearchResultSerializer(StoredFileMixin, serializers.ModelSerializer):
+    folder_name = serializers.CharField(source='folder.name', read_only=True, default=None)
+    rank = serializers.FloatField(read_only=True)
+    name_highlight = serializers.CharField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Folder_Files
+        fields = ['id', 'file_name', 'file', 'folder', 'folder_name', 'date_creation',
+                  'is_archive', 'rank', 'name_highlight', 'snippet']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    expires_at = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'folder', 'uploaded_by', 'file_name', 'total_size', 'received_bytes',
+                  'is_confidential', 'file', 'created_at', 'updated_at', 'expires_at']
+        read_only_fields = ['received_bytes', 'file', 'created_at', 'updated_at']
+
+    def get_expires_at(self, obj):
+        if obj.file_id:
+            return None
+        return obj.updated_at + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+    def validate_file_name(self, value):
+        # Same checks as a direct upload, applied before any bytes arrive.
+        for validator in Folder_Files._meta.get_field('file').validators:
+            validator(File(None, name=value))
+        return value
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("total_size must be positive.")
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Files may be at most {settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('folder') and not attrs.get('is_confidential'):
+            raise serializers.ValidationError("folder is required unless the file is confidential.")
+        return attrs
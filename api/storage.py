@@ -0,0 +1,169 @@
+# storage.py
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+BLOB_PREFIX = 'blobs/'
+COPY_CHUNK = 1024 * 1024
+
+
+def blob_name(sha256, original_name):
+    ext = os.path.splitext(original_name)[1].lower()
+    return f'{BLOB_PREFIX}{sha256[:2]}/{sha256}{ext}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def file_digest(path):
+    """(sha256 hex digest, size in bytes) of a file on disk."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(COPY_CHUNK), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that stores uploads under CONTENT_ADDRESSED_PREFIXES
+    once per content: the bytes go to blobs/<sha[:2]>/<sha256><ext> and
+    every save of the same content only adds a reference to its Blob row.
+    delete() drops one reference and removes the file with the last one,
+    so rows sharing a blob can be deleted independently. Other names (profile
+    pictures, thumbnails) are stored as plain files.
+
+    Saving content that carries a `sha256` attribute skips writing entirely
+    when the blob already exists.
+    """
+
+    def _save(self, name, content):
+        if not name.startswith(tuple(settings.CONTENT_ADDRESSED_PREFIXES)):
+            return super()._save(name, content)
+
+        sha256 = getattr(content, 'sha256', None)
+        existing = sha256 and self._add_reference(sha256)
+        if existing:
+            return existing
+
+        tmp, sha256, size = self._stage(content, sha256)
+        try:
+            return self._store(tmp, sha256, size, name)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _stage(self, content, sha256=None):
+        """
+        Copy `content` next to the blobs while hashing it, in one pass. A
+        digest the upload handlers already computed is trusted as is.
+        """
+        if hasattr(content, 'temporary_file_path'):
+            # Already on disk (a large upload or a finished resumable one):
+            # move it rather than copying.
+            path = content.temporary_file_path()
+            if sha256:
+                size = os.path.getsize(path)
+            else:
+                sha256, size = file_digest(path)
+            tmp = self._temp_name()
+            file_move_safe(path, tmp, allow_overwrite=True)
+            return tmp, sha256, size
+
+        digest = hashlib.sha256()
+        size = 0
+        tmp = self._temp_name()
+        with open(tmp, 'wb') as out:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks(COPY_CHUNK):
+                if not sha256:
+                    digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        return tmp, sha256 or digest.hexdigest(), size
+
+    def _temp_name(self):
+        directory = self.path(BLOB_PREFIX + 'tmp')
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        os.close(fd)
+        return tmp
+
+    def _add_reference(self, sha256):
+        """Count one more use of an existing blob and return its name, or None."""
+        from .models import Blob
+        with transaction.atomic():
+            if Blob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+                return Blob.objects.values_list('path', flat=True).get(sha256=sha256)
+        return None
+
+    def _store(self, tmp, sha256, size, name):
+        from .models import Blob
+        target = blob_name(sha256, name)
+        while True:
+            with transaction.atomic():
+                existing = self._add_reference(sha256)
+                if existing:
+                    return existing
+                try:
+                    with transaction.atomic():
+                        blob = Blob.objects.create(sha256=sha256, path=target, size_bytes=size, ref_count=1)
+                except IntegrityError:
+                    continue  # saved concurrently; take a reference to that one
+                path = self.path(target)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp, self.file_permissions_mode)
+                os.replace(tmp, path)
+                return blob.path
+
+    def adopt(self, name, references=1):
+        """
+        Make the plain stored file `name` a blob with `references` more uses
+        and return the blob's name. The original file is left in place (the
+        blob is a hard link or copy of it) for the caller to delete once its
+        rows point at the blob.
+        """
+        from .models import Blob
+        path = self.path(name)
+        sha256, size = file_digest(path)
+        tmp = self._temp_name()
+        try:
+            os.remove(tmp)
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        try:
+            blob = self._store(tmp, sha256, size, name)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        if references > 1:
+            Blob.objects.filter(path=blob).update(ref_count=F('ref_count') + references - 1)
+        return blob
+
+    def delete(self, name):
+        if not is_blob(name):
+            return super().delete(name)
+        from .models import Blob
+        with transaction.atomic():
+            Blob.objects.filter(path=name).update(ref_count=F('ref_count') - 1)
+            removed, _ = Blob.objects.filter(path=name, ref_count__lte=0).delete()
+            if removed:
+                super().delete(name)
+
+    def get_available_name(self, name, max_length=None):
+        if name.startswith(tuple(settings.CONTENT_ADDRESSED_PREFIXES)):
+            return name  # replaced by the blob name in _save()
+        return super().get_available_name(name, max_length)
@@ -1,3 +1,469 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import uploads
+from .downloads import sign_download
+from .folder_stats import COUNTERS, recompute
+from .models import (Blob, ConversionJob, Folder_Files, Folders, FolderStats, Logs, Profile,
+                     StorageUsageRollup, UploadSession)
+from .query_plans import LISTINGS, explain_listing, plan_problems
+
+
+class ListingQueryCountTests(TestCase):
+    """
+    Every listing must load its rows and their relations in a fixed number
+    of queries: doubling the rows may not add any.
+    """
+    URLS = [
+        '/api/files/',
+        '/api/folders/',
+        '/api/folders/{folder}/files/',
+        '/api/files/archives/',
+        '/api/files/backups/',
+        '/api/file/confidential/',
+        '/api/files/recent-uploads/',
+        '/api/logs/',
+        '/api/logs/query/',
+        '/api/non-staff-users/',
+        '/api/non-staff-users/?fields=id,picture_variants',
+    ]
+    ROWS = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.folder = Folders.objects.create(name='Reports', created_by=User.objects.create(username='owner'))
+        cls.added = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.added += 1
+            n = self.added
+            user = User.objects.create(username=f'user{n}', first_name=f'First{n}')
+            Profile.objects.create(user=user, address=f'Street {n}')
+            folder = Folders.objects.create(name=f'Folder {n}', created_by=user)
+            for target, flags in [(self.folder, {}), (folder, {}),
+                                  (self.folder, {'is_archive': True}),
+                                  (self.folder, {'is_backup': True}),
+                                  (folder, {'is_confidential': True})]:
+                Folder_Files.objects.create(
+                    folder=target, uploaded_by=user, file=f'files/report-{n}.pdf',
+                    file_name=f'report-{n}.pdf', size_bytes=1024, content_type='application/pdf',
+                    **flags)
+            Logs.objects.create(info1=f'First{n} uploaded a file', actor=user,
+                                action='upload', target_type='file')
+
+    def query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(self.ROWS)
+        urls = [url.format(folder=self.folder.id) for url in self.URLS]
+        urls += [url + ('&' if '?' in url else '?') + 'paginate=cursor' for url in urls]
+        counts = {url: self.query_count(url) for url in urls}
+
+        self.add_rows(self.ROWS)
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(counts[url]):
+                self.client.get(url)
+
+
+@skipUnless(connection.vendor == 'sqlite', "reads SQLite query plans")
+class QueryPlanTests(TestCase):
+    """
+    Every listing must be served from an index: EXPLAIN QUERY PLAN may show
+    no full table scan and no sort of the whole result.
+    """
+
+    def test_listings_use_an_index(self):
+        for view_class, kwargs, index in LISTINGS:
+            with self.subTest(view=view_class.__name__):
+                plan = explain_listing(view_class, kwargs)
+                self.assertEqual(plan_problems(view_class, plan, index), [], plan)
+
+
+class MediaRootMixin:
+    """Runs each test against an empty, temporary MEDIA_ROOT and staging directory."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_STAGING_DIR=os.path.join(media_root, 'staging'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def write_media(self, name, content):
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(content)
+
+
+class ConversionAccessTests(MediaRootMixin, TestCase):
+    """Converting a file, and reading the result, needs the right to download it."""
+
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create(username='owner')
+        folder = Folders.objects.create(name='Finance', created_by=owner)
+        self.secret = Folder_Files.objects.create(
+            folder=folder, uploaded_by=owner, file='files/budget.pdf', file_name='budget.pdf',
+            is_confidential=True)
+        self.public = Folder_Files.objects.create(
+            folder=folder, uploaded_by=owner, file='files/notice.pdf', file_name='notice.pdf')
+        self.write_media('files/budget.pdf', b'%PDF-1.4 secret')
+        self.write_media('files/notice.pdf', b'%PDF-1.4 public')
+
+    def convert(self, file_url):
+        return self.client.post('/api/convert-to-pdf/', {'fileUrl': file_url})
+
+    def test_confidential_source_is_refused(self):
+        for file_url in ['http://x/media/files/budget.pdf',
+                         f'http://x/api/files/{self.secret.id}/download/']:
+            with self.subTest(file_url=file_url):
+                self.assertEqual(self.convert(file_url).status_code, 403)
+        self.assertFalse(ConversionJob.objects.exists())
+
+    def test_converted_output_is_not_a_source(self):
+        self.write_media('converted/ab/abc-v1.pdf', b'%PDF-1.4 secret')
+        self.assertEqual(self.convert('http://x/media/converted/ab/abc-v1.pdf').status_code, 403)
+
+    def test_public_source_is_converted(self):
+        response = self.convert(f'http://x/api/files/{self.public.id}/download/')
+        self.assertEqual(response.status_code, 202)
+        job = ConversionJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual(self.client.get(f'/api/convert-to-pdf/{job.id}/').status_code, 200)
+
+    def test_signed_download_url_grants_the_job(self):
+        file_url = f'http://x/api/files/{self.secret.id}/download/?signature={sign_download(self.secret.id)}'
+        response = self.convert(file_url)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(self.client.get(f'/api/convert-to-pdf/{job_id}/').status_code, 403)
+        self.assertEqual(self.client.get(response.json()['status_url']).status_code, 200)
+
+    def test_result_of_confidential_job_needs_permission(self):
+        self.write_media('converted/ab/abc-v1.pdf', b'%PDF-1.4 secret')
+        job = ConversionJob.objects.create(source='files/budget.pdf', status=ConversionJob.DONE,
+                                           output='converted/ab/abc-v1.pdf')
+        self.assertEqual(self.client.get(f'/api/convert-to-pdf/{job.id}/pdf/').status_code, 403)
+        owner = APIClient()
+        owner.force_authenticate(User.objects.get(username='owner'))
+        response = owner.get(f'/api/convert-to-pdf/{job.id}/pdf/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 secret')
+
+
+class ConditionalListTests(TestCase):
+    """A list's ETag must change with anything the list renders."""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner', first_name='Ann')
+        folder = Folders.objects.create(name='Reports', created_by=self.owner)
+        self.files = [Folder_Files.objects.create(folder=folder, uploaded_by=self.owner,
+                                                  file=f'files/r{n}.pdf', file_name=f'r{n}.pdf')
+                      for n in range(2)]
+
+    def etag(self):
+        response = self.client.get('/api/files/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        return response['ETag']
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/files/', HTTP_IF_NONE_MATCH=self.etag())
+        self.assertEqual(response.status_code, 304)
+
+    def test_deletion_changes_the_etag(self):
+        etag = self.etag()
+        self.files[0].delete()
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_if_modified_since_alone_is_ignored(self):
+        self.files[0].delete()
+        response = self.client.get('/api/files/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_renamed_uploader_changes_the_etag(self):
+        etag = self.etag()
+        User.objects.filter(id=self.owner.id).update(first_name='Anne')
+        self.assertNotEqual(self.etag(), etag)
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    """Identical uploads share one blob, which goes with its last reference."""
+
+    def setUp(self):
+        super().setUp()
+        self.storage = Folder_Files._meta.get_field('file').storage
+        owner = User.objects.create(username='owner')
+        self.folder = Folders.objects.create(name='Reports', created_by=owner)
+        self.owner = owner
+
+    def upload(self, content, name='report.pdf'):
+        f = Folder_Files(folder=self.folder, uploaded_by=self.owner, file_name=name)
+        f.file.save(name, ContentFile(content), save=True)
+        return f
+
+    def test_same_bytes_share_one_blob(self):
+        first = self.upload(b'%PDF-1.4 same')
+        second = self.upload(b'%PDF-1.4 same', 'copy.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+        blob = Blob.objects.get()
+        self.assertEqual((blob.path, blob.ref_count, blob.size_bytes), (first.file.name, 2, 13))
+        self.assertNotEqual(self.upload(b'%PDF-1.4 other').file.name, first.file.name)
+
+    def test_file_goes_with_its_last_reference(self):
+        first = self.upload(b'%PDF-1.4 same')
+        second = self.upload(b'%PDF-1.4 same')
+        name = first.file.name
+
+        first.file.delete(save=False)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(Blob.objects.get(path=name).ref_count, 1)
+
+        second.file.delete(save=False)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_adopt_counts_every_reference(self):
+        self.write_media('files/old.pdf', b'%PDF-1.4 old')
+        blob = self.storage.adopt('files/old.pdf', references=3)
+        self.assertEqual(Blob.objects.get(path=blob).ref_count, 3)
+        self.assertTrue(self.storage.exists('files/old.pdf'))  # left for the caller
+
+        # Adopting the same content again adds to the same blob.
+        self.write_media('files/again.pdf', b'%PDF-1.4 old')
+        self.assertEqual(self.storage.adopt('files/again.pdf'), blob)
+        self.assertEqual(Blob.objects.get(path=blob).ref_count, 4)
+
+    def test_dedupe_files_moves_plain_files_into_blobs(self):
+        for name in ['files/a.pdf', 'files/b.pdf']:
+            self.write_media(name, b'%PDF-1.4 dup')
+            Folder_Files.objects.create(folder=self.folder, uploaded_by=self.owner, file=name)
+        Folder_Files.objects.create(folder=self.folder, uploaded_by=self.owner, file='files/a.pdf')
+
+        call_command('dedupe_files', stdout=StringIO())
+        names = set(Folder_Files.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.path, blob.ref_count), (names.pop(), 3))
+        self.assertFalse(self.storage.exists('files/a.pdf'))
+        self.assertFalse(self.storage.exists('files/b.pdf'))
+
+    def test_recount_rebuilds_reference_counts(self):
+        kept = self.upload(b'%PDF-1.4 kept')
+        self.upload(b'%PDF-1.4 kept')
+        unused = self.upload(b'%PDF-1.4 unused')
+        Folder_Files.objects.filter(id=unused.id).delete()  # row gone, reference left behind
+        Blob.objects.filter(path=kept.file.name).update(ref_count=7)
+
+        call_command('dedupe_files', '--recount', stdout=StringIO())
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertTrue(self.storage.exists(kept.file.name))
+        self.assertFalse(self.storage.exists(unused.file.name))
+
+
+class ResumableUploadTests(MediaRootMixin, TestCase):
+    """Chunked uploads through /api/uploads/."""
+    CONTENT = b'%PDF-1.4 ' + b'x' * 100
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.folder = Folders.objects.create(name='Reports', created_by=self.owner)
+        response = self.client.post('/api/uploads/', {
+            'folder': self.folder.id, 'uploaded_by': self.owner.id,
+            'file_name': 'report.pdf', 'total_size': len(self.CONTENT)}, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.url = f"/api/uploads/{response.json()['id']}/"
+
+    def send(self, offset, chunk):
+        return self.client.patch(self.url, chunk, content_type='application/offset+octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunk_at_the_wrong_offset_conflicts(self):
+        self.assertEqual(self.send(0, self.CONTENT[:50]).status_code, 200)
+        response = self.send(10, self.CONTENT[10:60])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '50')
+        self.assertEqual(response.json()['offset'], 50)
+
+        # A retry of the last chunk for the same offset is fine.
+        self.assertEqual(self.client.get(self.url)['Upload-Offset'], '50')
+        self.assertEqual(self.send(50, self.CONTENT[50:]).status_code, 200)
+        self.assertEqual(self.client.get(self.url).json()['received_bytes'], len(self.CONTENT))
+
+    def test_finalize_is_idempotent(self):
+        self.assertEqual(self.client.post(self.url + 'finalize/').status_code, 409)  # nothing sent yet
+        self.send(0, self.CONTENT)
+        first = self.client.post(self.url + 'finalize/')
+        second = self.client.post(self.url + 'finalize/')
+        self.assertEqual(first.status_code, 201, first.content)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        f = Folder_Files.objects.get()
+        self.assertEqual((f.size_bytes, f.content_type), (len(self.CONTENT), 'application/pdf'))
+        with f.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.CONTENT)
+        self.assertEqual(self.send(0, self.CONTENT).status_code, 409)
+
+    def test_idle_sessions_expire(self):
+        self.send(0, self.CONTENT[:50])
+        session = UploadSession.objects.get()
+        staging = uploads.staging_path(session.id)
+        self.assertTrue(os.path.exists(staging))
+
+        self.assertEqual(uploads.expire(), 0)
+        later = timezone.now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL + 1)
+        self.assertEqual(uploads.expire(now=later), 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(staging))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class BulkFileActionStatsTests(TestCase):
+    """Bulk actions keep FolderStats equal to what recompute() rebuilds."""
+
+    def setUp(self):
+        owner = User.objects.create(username='owner')
+        self.source = Folders.objects.create(name='Source', created_by=owner)
+        self.target = Folders.objects.create(name='Target', created_by=owner)
+        self.files = [
+            Folder_Files.objects.create(
+                folder=folder, uploaded_by=owner, file=f'files/f{n}.pdf', file_name=f'f{n}.pdf',
+                size_bytes=100 * (n + 1), is_archive=n % 3 == 1, is_backup=n % 2 == 1)
+            for n, folder in enumerate([self.source] * 4 + [self.target] * 2)
+        ]
+        recompute()
+
+    def counters(self):
+        return {stats.folder_id: {key: getattr(stats, key) for key in COUNTERS}
+                for stats in FolderStats.objects.all()}
+
+    def assertStatsMatchRecompute(self, action, payload):
+        response = self.client.post(f'/api/files/bulk/{action}/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertGreater(response.json()['changed'], 0)
+        maintained = self.counters()
+        recompute()
+        self.assertEqual(maintained, self.counters())
+
+    def run_action(self, action, **extra):
+        ids = [f.id for f in self.files[:3]] + [self.files[4].id]
+        for payload in ({'ids': ids}, {'filter': {'folder': self.source.id}}):
+            with self.subTest(payload=payload):
+                sid = transaction.savepoint()
+                self.assertStatsMatchRecompute(action, {**payload, **extra})
+                transaction.savepoint_rollback(sid)
+
+    def test_archive(self):
+        self.run_action('archive')
+
+    def test_backup(self):
+        self.run_action('backup')
+
+    def test_move(self):
+        self.run_action('move', folder=self.target.id)
+
+    def test_delete(self):
+        self.run_action('delete')
+
+
+class UploadSignatureTests(MediaRootMixin, TestCase):
+    """Uploads are judged by their bytes, not by the name or Content-Type they claim."""
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+    PDF = b'%PDF-1.4 ' + b'x' * 64
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner')
+        self.folder = Folders.objects.create(name='Reports', created_by=self.owner)
+        self.url = f'/api/file/{self.folder.id}/upload/{self.owner.id}/'
+
+    def test_renamed_file_is_rejected(self):
+        renamed = SimpleUploadedFile('invoice.pdf', self.PNG, content_type='application/pdf')
+        response = self.client.post(self.url, {'file': renamed})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file', response.json())
+
+        renamed.seek(0)
+        valid = SimpleUploadedFile('notes.pdf', self.PDF, content_type='application/pdf')
+        response = self.client.post(self.url + 'batch/', {'files': [valid, renamed]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('do not look like a .pdf file', response.content.decode())
+        self.assertFalse(Folder_Files.objects.exists())
+        self.assertFalse(Blob.objects.exists())
+
+    def test_valid_upload_records_its_content(self):
+        # The client's Content-Type is wrong; the recorded one comes from the bytes.
+        upload = SimpleUploadedFile('report.pdf', self.PDF, content_type='application/octet-stream')
+        response = self.client.post(self.url, {'file': upload})
+        self.assertEqual(response.status_code, 201, response.content)
+        f = Folder_Files.objects.get()
+        sha256 = hashlib.sha256(self.PDF).hexdigest()
+        self.assertEqual((f.size_bytes, f.content_type), (len(self.PDF), 'application/pdf'))
+        self.assertEqual(f.file.name, f'blobs/{sha256[:2]}/{sha256}.pdf')
+        self.assertEqual(Blob.objects.get().sha256, sha256)
+
+
+class StorageUsageRollupTests(TestCase):
+    """An incremental rollup must end up where a full rebuild would."""
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.folder = Folders.objects.create(name='Reports', created_by=self.owner)
+        self.other = Folders.objects.create(name='Other', created_by=self.owner)
+        now = timezone.now()
+        self.files = []
+        for days_ago in [70, 40, 40, 3, 0]:
+            f = Folder_Files.objects.create(folder=self.folder, uploaded_by=self.owner,
+                                            file='files/r.pdf', size_bytes=100)
+            Folder_Files.objects.filter(id=f.id).update(
+                date_creation=now - timedelta(days=days_ago), updated_at=now - timedelta(days=days_ago))
+            self.files.append(f)
+        self.rollup('--full')
+
+    def rollup(self, *args):
+        call_command('rollup_storage_usage', *args, stdout=StringIO())
+        return sorted(StorageUsageRollup.objects.values_list(
+            'granularity', 'bucket', 'folder_id', 'file_count', 'archive_count', 'backup_bytes'))
+
+    def test_changes_to_older_buckets_are_picked_up(self):
+        changed = timezone.now()
+        Folder_Files.objects.filter(id=self.files[0].id).update(is_archive=True, updated_at=changed)
+        Folder_Files.objects.filter(id=self.files[1].id).update(folder=self.other, updated_at=changed)
+        Folder_Files.objects.filter(id=self.files[2].id).update(is_backup=True, updated_at=changed)
+        Folder_Files.objects.filter(id=self.files[3].id).delete()
+
+        incremental = self.rollup()
+        self.assertEqual(incremental, self.rollup('--full'))
+        self.assertTrue(StorageUsageRollup.objects.filter(folder=self.other).exists())
+
+    def test_unchanged_older_buckets_are_left_alone(self):
+        older = set(StorageUsageRollup.objects.exclude(
+            bucket__gte=timezone.localdate().replace(day=1)).values_list('id', flat=True))
+        self.rollup()
+        self.assertTrue(older)
+        self.assertLessEqual(older, set(StorageUsageRollup.objects.values_list('id', flat=True)))
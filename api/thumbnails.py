@@ -0,0 +1,143 @@
+# thumbnails.py
+import hashlib
+import importlib.util
+import mimetypes
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .models import Folder_Files
+
+# Longest side in pixels of each derivative. 'small' is for file listings,
+# 'large' for a preview before opening the original.
+SIZES = {'small': 256, 'large': 1024}
+JPEG_QUALITY = 80
+PDF_RENDER_TIMEOUT = 30
+
+IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp'}
+PDF_TYPES = {'application/pdf'}
+
+
+def source_kind(content_type, file_name):
+    """'image' or 'pdf' when a derivative can be rendered for the file, else None."""
+    content_type = content_type or mimetypes.guess_type(file_name)[0]
+    if content_type in IMAGE_TYPES:
+        return 'image'
+    if content_type in PDF_TYPES:
+        return 'pdf' if pdf_renderer() else None
+    return None
+
+
+def version(file_name):
+    # Changes when the stored file does, so URLs carrying it can be cached forever.
+    return hashlib.md5(file_name.encode()).hexdigest()[:12]
+
+
+def derivative_name(file_id, file_name, size):
+    return f'thumbnails/{file_id}-{version(file_name)}-{size}.jpg'
+
+
+def derivative_names(file_id, file_name):
+    return [derivative_name(file_id, file_name, size) for size in SIZES]
+
+
+def media_path(name):
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def pdf_renderer():
+    if shutil.which('pdftoppm'):
+        return 'pdftoppm'
+    if importlib.util.find_spec('fitz') is not None:
+        return 'pymupdf'
+    return None
+
+
+def render_pdf_page(path, longest_side):
+    """First page of a PDF as a PIL image, `longest_side` pixels at most."""
+    if pdf_renderer() == 'pdftoppm':
+        with tempfile.TemporaryDirectory() as workdir:
+            prefix = os.path.join(workdir, 'page')
+            subprocess.run(['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png',
+                            '-scale-to', str(longest_side), path, prefix],
+                           check=True, capture_output=True, timeout=PDF_RENDER_TIMEOUT)
+            with Image.open(prefix + '.png') as page:
+                page.load()
+                return page
+
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as document:
+        page = document[0]
+        zoom = longest_side / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def to_rgb(image):
+    """Upright RGB copy of an image, transparency flattened onto white."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def save_image(image, name, pil_format, **options):
+    """
+    Write `image` to MEDIA_ROOT/name under a temporary name first, so a
+    concurrent render or reader never sees half a file.
+    """
+    path = media_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as fh:
+        image.save(fh, pil_format, **options)
+    os.chmod(tmp, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+    os.replace(tmp, path)
+
+
+def open_source(path, kind, longest_side):
+    if kind == 'pdf':
+        return render_pdf_page(path, longest_side)
+    image = Image.open(path)
+    # JPEG can decode straight at a reduced scale, much faster than full size.
+    image.draft('RGB', (longest_side, longest_side))
+    return to_rgb(image)
+
+
+def render_derivatives(file_id):
+    """Write every missing derivative of a file; returns the names written."""
+    f = Folder_Files.objects.filter(id=file_id).only('id', 'file', 'content_type').first()
+    if f is None or not f.file:
+        return []
+    kind = source_kind(f.content_type, f.file.name)
+    if kind is None:
+        return []
+    missing = [(size, name) for size, name in zip(SIZES, derivative_names(f.id, f.file.name))
+               if not os.path.exists(media_path(name))]
+    if not missing:
+        return []
+
+    image = open_source(f.file.path, kind, max(SIZES.values()))
+    written = []
+    # Largest first, each one downscaled from the previous.
+    for size, name in sorted(missing, key=lambda item: -SIZES[item[0]]):
+        image.thumbnail((SIZES[size], SIZES[size]), Image.LANCZOS)
+        save_image(image, name, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        written.append(name)
+    return written
+
+
+def delete_derivatives(file_id, file_name):
+    for name in derivative_names(file_id, file_name):
+        try:
+            os.remove(media_path(name))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,131 @@
+# upload_handlers.py
+import hashlib
+import mimetypes
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+SNIFF_BYTES = 8192
+
+OLE2 = 'application/x-ole-storage'  # legacy .doc/.ppt/.xls container
+
+# Types a file's extension may stand for, by what its first bytes say it is.
+EXTENSION_TYPES = {
+    'jpg': {'image/jpeg'},
+    'jpeg': {'image/jpeg'},
+    'png': {'image/png'},
+    'pdf': {'application/pdf'},
+    'docx': {'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'application/zip'},
+    'ppt': {OLE2},
+    'xls': {OLE2},
+}
+
+
+def sniff(head):
+    """MIME type of a file judged by its first bytes, or None if unknown."""
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return OLE2
+    if head.startswith(b'PK\x03\x04'):
+        # Office Open XML parts are usually among the first zip entries.
+        if b'word/' in head:
+            return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        if b'ppt/' in head:
+            return 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+        if b'xl/' in head:
+            return 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return 'application/zip'
+    return None
+
+
+def detected_type(value):
+    """
+    The sniffed type of an upload: set by the handlers below while it
+    streamed in, otherwise read from its first bytes. None for files that
+    are already stored.
+    """
+    if hasattr(value, 'detected_type'):
+        return value.detected_type
+    if getattr(value, '_committed', False) or not hasattr(value, 'read'):
+        return None
+    position = value.tell()
+    value.seek(0)
+    head = value.read(SNIFF_BYTES)
+    value.seek(position)
+    value.detected_type = sniff(head)
+    return value.detected_type
+
+
+def content_type_of(upload):
+    """
+    MIME type to record for an upload: the sniffed type when it is specific,
+    otherwise the one implied by the name. The client's Content-Type header
+    is only a last resort.
+    """
+    sniffed = detected_type(upload)
+    if sniffed in ('application/zip', OLE2):
+        sniffed = None
+    return sniffed or mimetypes.guess_type(upload.name)[0] or getattr(upload, 'content_type', None)
+
+
+def validate_file_signature(value):
+    """Reject uploads whose content doesn't match their extension."""
+    if getattr(value, '_committed', False) or not hasattr(value, 'read'):
+        return  # already stored, or only a name to check so far
+    ext = os.path.splitext(value.name)[1].lstrip('.').lower()
+    allowed = EXTENSION_TYPES.get(ext)
+    if allowed is None:
+        return  # left to FileExtensionValidator
+    if detected_type(value) not in allowed:
+        raise ValidationError(
+            "The contents of %(name)s do not look like a .%(ext)s file.",
+            code='invalid_signature', params={'name': value.name, 'ext': ext})
+
+
+class DigestMixin:
+    """
+    Computes the size, SHA-256 and sniffed MIME type of each file as its
+    chunks arrive and sets them on the uploaded file as `size`, `sha256` and
+    `detected_type`, so nothing has to read the file again afterwards.
+    Only the handler that actually keeps the data does the work.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Set up first: MemoryFileUploadHandler.new_file() raises
+        # StopFutureHandlers when it takes the file.
+        self._digest = hashlib.sha256()
+        self._head = b''
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            self._digest.update(raw_data)
+            if len(self._head) < SNIFF_BYTES:
+                self._head += raw_data[:SNIFF_BYTES - len(self._head)]
+        return passed_on
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self._digest.hexdigest()
+            uploaded.detected_type = sniff(self._head)
+        return uploaded
+
+
+class DigestingMemoryFileUploadHandler(DigestMixin, MemoryFileUploadHandler):
+    pass
+
+
+class DigestingTemporaryFileUploadHandler(DigestMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,131 @@
+# uploads.py
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .background import run_in_background
+from .folder_stats import file_state, record_change
+from .models import Folder_Files, UploadSession
+from .search import index_file
+from .thumbnails import render_derivatives
+from .upload_handlers import content_type_of, validate_file_signature
+
+READ_SIZE = 256 * 1024
+
+
+class OffsetMismatch(Exception):
+    def __init__(self, offset):
+        super().__init__(f"Expected offset {offset}")
+        self.offset = offset
+
+
+class StagedFile(File):
+    # FileSystemStorage moves a file that reports a temporary path instead
+    # of copying it, so finalizing costs a rename.
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def staging_path(session_id):
+    return os.path.join(settings.UPLOAD_STAGING_DIR, f'{session_id}.part')
+
+
+def start(session):
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    open(staging_path(session.id), 'wb').close()
+
+
+def append_chunk(session, offset, stream, length):
+    """
+    Write `length` bytes read from `stream` at `offset` of the staging file
+    and return the new offset. The offset must be where the last chunk
+    ended; a retried chunk for the same offset overwrites what it wrote.
+    """
+    if offset != session.received_bytes:
+        raise OffsetMismatch(session.received_bytes)
+    written = 0
+    with open(staging_path(session.id), 'r+b') as fh:
+        fh.seek(offset)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            fh.write(data)
+            written += len(data)
+        fh.truncate()
+    end = offset + written
+    # Only one of two concurrent writers for an offset gets to move it on.
+    moved = UploadSession.objects.filter(id=session.id, received_bytes=offset).update(
+        received_bytes=end, updated_at=timezone.now())
+    if not moved:
+        raise OffsetMismatch(UploadSession.objects.get(id=session.id).received_bytes)
+    session.received_bytes = end
+    return end
+
+
+def finalize(session):
+    """
+    Store the complete staging file as a Folder_Files row and return it.
+    Raises ValidationError, keeping the staging file, when its contents
+    don't match the file name's extension.
+    """
+    field = Folder_Files._meta.get_field('file')
+    path = staging_path(session.id)
+    with open(path, 'rb') as fh:
+        staged = StagedFile(fh, name=session.file_name)
+        validate_file_signature(staged)
+        content_type = content_type_of(staged)
+        name = field.storage.save(field.generate_filename(None, session.file_name),
+                                  staged, max_length=field.max_length)
+    try:
+        with transaction.atomic():
+            f = Folder_Files.objects.create(
+                folder=session.folder,
+                uploaded_by=session.uploaded_by,
+                file=name,
+                file_name=session.file_name,
+                is_confidential=session.is_confidential,
+                size_bytes=session.total_size,
+                content_type=content_type,
+            )
+            record_change(None, file_state(f))
+            UploadSession.objects.filter(id=session.id).update(file=f)
+            run_in_background(index_file, f.id)
+            run_in_background(render_derivatives, f.id)
+    except Exception:
+        field.storage.delete(name)
+        raise
+    session.file = f
+    return f
+
+
+def discard(session_id):
+    try:
+        os.remove(staging_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+def expire(now=None):
+    """
+    Delete sessions idle for longer than UPLOAD_SESSION_TTL, with their
+    staging files, and staging files no session refers to. Returns the
+    number of sessions removed.
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    stale = list(UploadSession.objects.filter(updated_at__lt=cutoff).values_list('id', flat=True))
+    for session_id in stale:
+        discard(session_id)
+    UploadSession.objects.filter(id__in=stale).delete()
+
+    if os.path.isdir(settings.UPLOAD_STAGING_DIR):
+        active = {str(i) for i in UploadSession.objects.filter(file__isnull=True).values_list('id', flat=True)}
+        for entry in os.scandir(settings.UPLOAD_STAGING_DIR):
+            session_id = entry.name.removesuffix('.part')
+            if session_id not in active and entry.stat().st_mtime < cutoff.timestamp():
+                os.remove(entry.path)
+    return len(stale)
@@ -17,25 +17,41 @@ urlpatterns = [
     path("folders/<int:folder_id>/rename/", views.RenameFolderView.as_view(), name="rename-folder"),
     
     path('file/<int:folder_id>/upload/<int:user_id>/', views.FileUploadView.as_view(), name='file-upload'),
+    path('file/<int:folder_id>/upload/<int:user_id>/batch/', views.BatchFileUploadView.as_view(), name='file-batch-upload'),
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('uploads/<uuid:session_id>/', views.UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:session_id>/finalize/', views.UploadSessionFinalizeView.as_view(), name='upload-session-finalize'),
     path('folders/<int:folder_id>/files/', views.FolderFilesListView.as_view(), name='folder-files-list'),
     path('files/', views.AllFilesView.as_view(), name='all-files'),
+    path('files/<int:file_id>/download/', views.FileDownloadView.as_view(), name='file-download'),
+    path('files/<int:file_id>/thumbnail/<str:size>/', views.FileThumbnailView.as_view(), name='file-thumbnail'),
     path('files/<int:pk>/delete/', views.FolderFileDeleteView.as_view(), name='delete_folder_file'),
     path('files/<int:pk>/archive/', views.FileArchiveView.as_view(), name='archive_folder_file'),
     path('files/archives/', views.FileArchiveListView.as_view(), name='folder_file_archives'),
     path('files/<int:pk>/unarchive/', views.FileUnarchiveView.as_view(), name='folder_file_unarchive'),
     path('files/total-size/', views.FolderFilesTotalSizeView.as_view(), name='files-total-size'),
+    path('files/bulk/<str:action>/', views.BulkFileActionView.as_view(), name='files-bulk-action'),
+    path('storage/usage/', views.StorageUsageView.as_view(), name='storage-usage'),
+    path('storage/purge/', views.StoragePurgeStatusView.as_view(), name='storage-purge-status'),
 
     path('file/upload/<int:user_id>/', views.ConfidentialFileUploadView.as_view(), name='confidential-file-upload'),
     path('file/confidential/', views.ConfidentialFileListView.as_view(), name='confidential-file-list'),
     path('confidential-files/<int:pk>/delete/', views.ConfidentialFileDeleteView.as_view(), name='confidential-file-delete'),
     path('files/recent-uploads/', views.RecentUploadFileView.as_view(), name='recent_upload_files'),
+    path('search/', views.FileSearchView.as_view(), name='file-search'),
     
     
     path('upload-logs/', views.LogsCreateView.as_view(), name='upload-logs'),
+    path('upload-logs/bulk/', views.LogsBulkCreateView.as_view(), name='upload-logs-bulk'),
     path('logs/', views.LogsListView.as_view(), name='logs-list'),
+    path('logs/query/', views.LogsQueryView.as_view(), name='logs-query'),
+    path('logs/archive/', views.ArchivedLogsView.as_view(), name='logs-archive'),
     
     
     path("convert-to-pdf/", views.convert_to_pdf, name="convert-to-pdf"),
+    path("convert-to-pdf/<int:job_id>/", views.conversion_job_status, name="convert-to-pdf-status"),
+    path("convert-to-pdf/<int:job_id>/pdf/", views.conversion_job_result, name="convert-to-pdf-result"),
+    path("convert-to-pdf/cache/", views.conversion_cache_stats, name="convert-to-pdf-cache"),
     
     path('users/<int:user_id>/delete/', views.DeleteUserView.as_view()),
     path('non-staff-users/', views.NonStaffUsersView.as_view(), name='non-staff-users'),
@@ -5,19 +5,135 @@ from django.contrib.auth.models import User
 from rest_framework import status, generics
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .serializers import FileUbackupSerializer, ConfidentialFileSerializer, FolderFilesTotalSizeSerializer, RegisterSerializer, LogsSerializer, ProfileSerializer, FolderSerializer, FileUnarchiveSerializer, FileArchiveSerializer, FolderFileCountSerializer, FolderTotalSizeSerializer, FolderFilesSerializer
-from .models import Profile, Folders, Folder_Files, Logs
+from .serializers import FileUbackupSerializer, ConfidentialFileSerializer, FolderFilesTotalSizeSerializer, RegisterSerializer, LogsSerializer, ProfileSerializer, FolderSerializer, FileUnarchiveSerializer, FileArchiveSerializer, FolderFileCountSerializer, FolderTotalSizeSerializer, FolderFilesSerializer, StorageUsageSerializer, BulkFileActionSerializer, SearchResultSerializer, UploadSessionSerializer, UserSummarySerializer
+from .models import Profile, Folders, Folder_Files, Logs, FolderStats, StorageUsageRollup, StoragePurge, ConversionJob, UploadSession
+from .purge import queue_file_purge, queue_profile_purge
+from .background import run_in_background
+from .search import index_file, search_files
+from .log_buffer import log_buffer
+from .log_archive import iter_archived_logs
+from .conversion import QueueFull, cache_stats, can_read_job, can_read_source, enqueue, sign_job, source_from_url
+from .downloads import can_download, file_response, media_response
+from . import uploads
+from .thumbnails import SIZES, delete_derivatives, derivative_name, render_derivatives, source_kind, version
+from .folder_stats import FileState, apply_deltas, bulk_change_deltas, file_state, record_change, record_changes, recompute, stats_for_folder
+from .upload_handlers import content_type_of
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+import hashlib
+from django.utils.dateparse import parse_date
 from rest_framework.parsers import MultiPartParser, FormParser
 import os
-import tempfile
-from django.http import JsonResponse
+from datetime import datetime, time, timedelta
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from docx2pdf import convert
-from urllib.parse import urlparse
+from urllib.parse import parse_qs, urlparse
+from django.urls import reverse
 from django.conf import settings
-import traceback
+import json
+from rest_framework.utils.encoders import JSONEncoder
+try:
+    import orjson
+except ImportError:  # optional, only makes streamed lists faster
+    orjson = None
+from .pagination import FileCursorPagination, FolderCursorPagination, LogCursorPagination, LogQueryCursorPagination, ProfileCursorPagination
+
+
+class SparseFieldsViewMixin:
+    """Loads only the columns a `?fields=` request renders (see SparseFieldsMixin)."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Cursor pagination reads its ordering columns off the rows.
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        extra = [field.lstrip('-') for field in ordering]
+        return self.get_serializer_class().sparse_queryset(queryset, self.request, extra)
+
+
+class ConditionalListMixin:
+    """
+    Answers polling clients with 304 Not Modified when the list is unchanged.
+
+    The ETag comes from one aggregate over the unpaginated queryset, the
+    newest `validator_field` timestamp and the row count, plus the summary
+    columns of the users the rows embed (`user_field`), which have no
+    timestamp of their own. It also covers the query string, so each page or
+    field selection gets its own ETag, and the requesting user, whose
+    permissions decide which download URLs are signed.
+
+    Only If-None-Match is answered. A deletion doesn't move the newest
+    timestamp, so Last-Modified is not sent: a client revalidating with
+    If-Modified-Since alone would keep a stale list.
+    """
+    validator_field = 'updated_at'
+    user_field = None
+
+    def get_validator_queryset(self):
+        return self.get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_validator_queryset().order_by()
+        validators = queryset.aggregate(
+            last_modified=Max(self.validator_field), count=Count('pk'))
+        last_modified = validators['last_modified']
+        digest = hashlib.md5(
+            f"{last_modified and last_modified.isoformat()}:{validators['count']}:"
+            f"{request.get_full_path()}:{request.user.pk}".encode())
+        if self.user_field:
+            users = User.objects.filter(id__in=queryset.values(self.user_field)).order_by('id')
+            for row in users.values_list(*UserSummarySerializer.Meta.fields):
+                digest.update(repr(row).encode())
+        etag = quote_etag(digest.hexdigest())
+
+        # Passing no last_modified makes If-Modified-Since ignored.
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+
+def dumps_json(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=JSONEncoder, separators=(',', ':')).encode()
+
+
+class StreamingListMixin:
+    """
+    `?stream=1` streams the list as a JSON array instead of building it in
+    memory: rows are read with .iterator() and encoded one at a time, so
+    memory stays flat and the first bytes go out straight away. Ignored when
+    the request asks for a cursor page.
+    """
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('stream') not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+        if self.paginator is not None and self.paginator.is_requested(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+
+        def rows():
+            yield b'['
+            separator = b''
+            for obj in queryset.iterator(chunk_size=self.stream_chunk_size):
+                yield separator + dumps_json(serializer.to_representation(obj))
+                separator = b','
+            yield b']'
+
+        return StreamingHttpResponse(rows(), content_type='application/json')
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -57,11 +173,11 @@ class UserProfileView(APIView):
 
     def get(self, request, user_id):
         try:
-            profile = Profile.objects.get(user__id=user_id)
+            profile = Profile.objects.select_related('user').get(user__id=user_id)
         except Profile.DoesNotExist:
             return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = ProfileSerializer(profile)
+        serializer = ProfileSerializer(profile, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -77,23 +193,25 @@ class CreateFolderView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class FolderListView(generics.ListAPIView):
+class FolderListView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
-    queryset = Folders.objects.all()
+    queryset = Folders.objects.select_related('created_by')
     serializer_class = FolderSerializer
+    user_field = 'created_by'
+    pagination_class = FolderCursorPagination
 
 
 class FolderFileCountView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, folder_id):
-        folder = get_object_or_404(Folders, id=folder_id)
-        file_count = Folder_Files.objects.filter(
-            folder=folder).exclude(is_archive=True).count()
+        stats = FolderStats.objects.filter(folder_id=folder_id).first()
+        if stats is None:
+            stats = stats_for_folder(get_object_or_404(Folders, id=folder_id))
 
         serializer = FolderFileCountSerializer({
-            'folder_id': folder.id,
-            'file_count': file_count
+            'folder_id': stats.folder_id,
+            'file_count': stats.file_count
         })
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -111,7 +229,8 @@ class FolderTotalSizeView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, folder_id):
-        folder = get_object_or_404(Folders, id=folder_id)
+        folder = get_object_or_404(
+            Folders.objects.select_related('stats'), id=folder_id)
         serializer = FolderTotalSizeSerializer(folder)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -141,29 +260,36 @@ class DeleteFolderView(APIView):
 
     def delete(self, request, folder_id):
         folder = get_object_or_404(Folders, id=folder_id)
-        folder.delete()
+        # The stored files are removed later by `manage.py purge_storage`.
+        with transaction.atomic():
+            queue_file_purge(Folder_Files.objects.filter(folder=folder),
+                             f"folder {folder.id} deleted")
+            folder.delete()
         return Response({"message": "Folder deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 
-class FolderFilesListView(generics.ListAPIView):
+class FolderFilesListView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = FolderFilesSerializer
+    user_field = 'uploaded_by'
 
     def get_queryset(self):
         folder_id = self.kwargs['folder_id']
-        return Folder_Files.objects.filter(
+        return Folder_Files.objects.select_related('uploaded_by').filter(
             folder_id=folder_id,
             is_archive=False,
             is_backup=False
         )
 
 
-class FileArchiveListView(generics.ListAPIView):
+class FileArchiveListView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = FolderFilesSerializer
+    user_field = 'uploaded_by'
+    pagination_class = FileCursorPagination
 
     def get_queryset(self):
-        return Folder_Files.objects.filter(is_archive=True)
+        return Folder_Files.objects.select_related('uploaded_by').filter(is_archive=True)
 
 
 class FileUploadView(APIView):
@@ -189,17 +315,220 @@ class FileUploadView(APIView):
 
         serializer = FolderFilesSerializer(data=data)  # ✅ use updated data
         if serializer.is_valid():
-            serializer.save(folder=folder, uploaded_by=user)
+            with transaction.atomic():
+                instance = serializer.save(folder=folder, uploaded_by=user)
+                record_change(None, file_state(instance))
+                run_in_background(index_file, instance.id)
+                run_in_background(render_derivatives, instance.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         print(serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class AllFilesView(generics.ListAPIView):
+class BatchFileUploadView(APIView):
+    """
+    Uploads many files into a folder in one multipart request (repeat the
+    `files` part). Every file is validated first, and any error rejects the
+    whole batch with the errors listed per file. Valid files are copied to
+    storage chunk by chunk and inserted with a single bulk_create. If that
+    fails, the files already stored are removed again.
+    """
     permission_classes = [AllowAny]
-    queryset = Folder_Files.objects.all()
+    parser_classes = (MultiPartParser, FormParser)
+
+    def post(self, request, folder_id, user_id):
+        folder = get_object_or_404(Folders, id=folder_id)
+        user = get_object_or_404(User, id=user_id)
+        uploads = request.FILES.getlist('files') or request.FILES.getlist('file')
+        if not uploads:
+            return Response({"error": "No files were uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+        field = Folder_Files._meta.get_field('file')
+        results = []
+        for upload in uploads:
+            try:
+                field.run_validators(upload)
+                results.append({'file_name': upload.name, 'errors': []})
+            except ValidationError as e:
+                results.append({'file_name': upload.name, 'errors': e.messages})
+        if any(r['errors'] for r in results):
+            return Response({"files": results}, status=status.HTTP_400_BAD_REQUEST)
+
+        stored = []
+        try:
+            for upload in uploads:
+                name = field.generate_filename(None, upload.name)
+                stored.append(field.storage.save(name, upload, max_length=field.max_length))
+
+            with transaction.atomic():
+                files = Folder_Files.objects.bulk_create([
+                    Folder_Files(
+                        folder=folder,
+                        uploaded_by=user,
+                        file=name,
+                        file_name=upload.name,
+                        size_bytes=upload.size,
+                        content_type=content_type_of(upload),
+                    )
+                    for upload, name in zip(uploads, stored)
+                ])
+                record_changes([(None, file_state(f)) for f in files])
+                for f in files:
+                    run_in_background(index_file, f.id)
+                    run_in_background(render_derivatives, f.id)
+        except Exception:
+            for name in stored:
+                field.storage.delete(name)
+            raise
+
+        serializer = FolderFilesSerializer(files, many=True, context={'request': request})
+        return Response({"files": serializer.data}, status=status.HTTP_201_CREATED)
+
+
+class FileDownloadView(APIView):
+    """
+    GET /api/files/<id>/download/ sends a stored file inline. Confidential
+    files need a staff user, their uploader, or the signed URL from the
+    serializer's download_url. See api/downloads.py for the transfer.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, file_id):
+        f = get_object_or_404(
+            Folder_Files.objects.only('id', 'file', 'file_name', 'content_type',
+                                      'is_confidential', 'uploaded_by'),
+            id=file_id)
+        if not can_download(request.user, f, request.query_params.get('signature')):
+            return Response({"detail": "You do not have access to this file."}, status=status.HTTP_403_FORBIDDEN)
+        if not f.file or not os.path.exists(f.file.path):
+            raise Http404("The file is missing from storage")
+        return file_response(request, f)
+
+
+class FileThumbnailView(APIView):
+    """
+    Serves the 'small' or 'large' JPEG derivative of an image or PDF file.
+    They are rendered in the background on upload, or here on the first
+    request if that hasn't happened yet. Serializer URLs carry ?v= of the
+    stored file, so responses may be cached for a year. Confidential files
+    are checked like downloads.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, file_id, size):
+        if size not in SIZES:
+            raise Http404
+        f = get_object_or_404(
+            Folder_Files.objects.only('id', 'file', 'content_type', 'is_confidential', 'uploaded_by'),
+            id=file_id)
+        if not f.file or source_kind(f.content_type, f.file.name) is None:
+            raise Http404
+        if not can_download(request.user, f, request.query_params.get('signature')):
+            return Response({"detail": "You do not have access to this file."}, status=status.HTTP_403_FORBIDDEN)
+
+        cache_control = f"{'private' if f.is_confidential else 'public'}, max-age=31536000, immutable"
+        etag = quote_etag(f"{version(f.file.name)}-{size}")
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['Cache-Control'] = cache_control
+            return not_modified
+
+        path = os.path.join(settings.MEDIA_ROOT, derivative_name(f.id, f.file.name, size))
+        if not os.path.exists(path):
+            try:
+                render_derivatives(f.id)
+            except Exception:
+                raise Http404("The file could not be rendered")
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """
+    Starts a resumable upload. POST folder (or is_confidential), uploaded_by,
+    file_name and total_size; then send the bytes in order with PATCH
+    uploads/<id>/ (raw body, Upload-Offset header), check progress with GET
+    uploads/<id>/ and finish with POST uploads/<id>/finalize/.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = UploadSessionSerializer
+
+    def perform_create(self, serializer):
+        uploads.start(serializer.save())
+
+
+class UploadSessionView(APIView):
+    permission_classes = [AllowAny]
+
+    def respond(self, session, status_code=status.HTTP_200_OK):
+        response = Response(UploadSessionSerializer(session).data, status=status_code)
+        response['Upload-Offset'] = str(session.received_bytes)
+        return response
+
+    def get(self, request, session_id):
+        return self.respond(get_object_or_404(UploadSession, id=session_id))
+
+    def patch(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id)
+        if session.file_id:
+            return Response({"error": "This upload is already finalized"}, status=status.HTTP_409_CONFLICT)
+        offset = request.headers.get('Upload-Offset', request.query_params.get('offset', ''))
+        length = request.headers.get('Content-Length', '')
+        if not offset.isdigit() or not length.isdigit() or int(length) == 0:
+            return Response({"error": "Send the chunk as the raw body with an Upload-Offset header"}, status=status.HTTP_400_BAD_REQUEST)
+        offset, length = int(offset), int(length)
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response({"error": f"Chunks may be at most {settings.UPLOAD_CHUNK_MAX_SIZE} bytes"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if offset + length > session.total_size:
+            return Response({"error": "The chunk runs past total_size"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            uploads.append_chunk(session, offset, request.stream, length)
+        except uploads.OffsetMismatch as e:
+            response = Response({"error": str(e), "offset": e.offset}, status=status.HTTP_409_CONFLICT)
+            response['Upload-Offset'] = str(e.offset)
+            return response
+        return self.respond(session)
+
+    def delete(self, request, session_id):
+        session = get_object_or_404(UploadSession, id=session_id)
+        if not session.file_id:
+            uploads.discard(session.id)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalizeView(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession.objects.select_related('folder', 'uploaded_by'), id=session_id)
+        if not session.file_id:
+            if session.received_bytes != session.total_size:
+                return Response({"error": f"Received {session.received_bytes} of {session.total_size} bytes",
+                                 "offset": session.received_bytes}, status=status.HTTP_409_CONFLICT)
+            try:
+                uploads.finalize(session)
+            except ValidationError as e:
+                return Response({"error": e.messages}, status=status.HTTP_400_BAD_REQUEST)
+            except FileNotFoundError:
+                # A concurrent finalize already moved the staging file.
+                session.refresh_from_db()
+                if not session.file_id:
+                    return Response({"error": "The upload is being finalized"}, status=status.HTTP_409_CONFLICT)
+        serializer = FolderFilesSerializer(session.file, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AllFilesView(ConditionalListMixin, StreamingListMixin, SparseFieldsViewMixin, generics.ListAPIView):
+    permission_classes = [AllowAny]
+    queryset = Folder_Files.objects.select_related('uploaded_by')
     serializer_class = FolderFilesSerializer
+    user_field = 'uploaded_by'
+    pagination_class = FileCursorPagination
 
 
 class FolderFileDeleteView(generics.DestroyAPIView):
@@ -208,18 +537,33 @@ class FolderFileDeleteView(generics.DestroyAPIView):
     permission_classes = [AllowAny]
 
     def perform_destroy(self, instance):
+        before = file_state(instance)
+        file_id = instance.id
+        with transaction.atomic():
+            instance.delete()
+            record_change(before, None)
         if instance.file:
+            delete_derivatives(file_id, instance.file.name)
             instance.file.delete(save=False)  # remove from storage
-        instance.delete()
 
 
-class FileArchiveView(generics.UpdateAPIView):
+class FolderStatsUpdateMixin:
+    """Keeps FolderStats in step with the flag flipped by the serializer."""
+
+    def perform_update(self, serializer):
+        before = file_state(serializer.instance)
+        with transaction.atomic():
+            instance = serializer.save()
+            record_change(before, file_state(instance))
+
+
+class FileArchiveView(FolderStatsUpdateMixin, generics.UpdateAPIView):
     queryset = Folder_Files.objects.all()
     serializer_class = FileArchiveSerializer
     permission_classes = [AllowAny]
 
 
-class FileUnarchiveView(generics.UpdateAPIView):
+class FileUnarchiveView(FolderStatsUpdateMixin, generics.UpdateAPIView):
     queryset = Folder_Files.objects.all()
     serializer_class = FileUnarchiveSerializer
     permission_classes = [AllowAny]
@@ -234,12 +578,15 @@ class ConfidentialFileUploadView(generics.CreateAPIView):
     def perform_create(self, serializer):
         user_id = self.kwargs.get("user_id")
         user = get_object_or_404(User, id=user_id)
-        serializer.save(uploaded_by=user, is_confidential=True)
+        instance = serializer.save(uploaded_by=user, is_confidential=True)
+        run_in_background(index_file, instance.id)
+        run_in_background(render_derivatives, instance.id)
 
 
-class ConfidentialFileListView(generics.ListAPIView):
+class ConfidentialFileListView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     serializer_class = ConfidentialFileSerializer
     permission_classes = [AllowAny]
+    pagination_class = FileCursorPagination
 
     def get_queryset(self):
         return Folder_Files.objects.filter(is_confidential=True)
@@ -251,6 +598,8 @@ class ConfidentialFileDeleteView(APIView):
     def delete(self, request, pk, format=None):
         try:
             file = Folder_Files.objects.get(id=pk, is_confidential=True)
+            if file.file:
+                delete_derivatives(file.id, file.file.name)
             file.file.delete(save=False)  # delete the actual file from storage
             file.delete()
             return Response({"detail": "Confidential file deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
@@ -258,15 +607,20 @@ class ConfidentialFileDeleteView(APIView):
             return Response({"detail": "Confidential file not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
-class RecentUploadFileView(generics.ListAPIView):
+class RecentUploadFileView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = FolderFilesSerializer
+    user_field = 'uploaded_by'
 
     def get_queryset(self):
+        return self.get_validator_queryset().select_related(
+            'uploaded_by').order_by('-date_creation')[:5]
+
+    def get_validator_queryset(self):
         return Folder_Files.objects.filter(
             is_archive=False,
             is_confidential=False
-        ).order_by('-date_creation')[:5]
+        )
 
 
 class LogsCreateView(generics.CreateAPIView):
@@ -274,11 +628,123 @@ class LogsCreateView(generics.CreateAPIView):
     queryset = Logs.objects.all()
     serializer_class = LogsSerializer
 
+    def create(self, request, *args, **kwargs):
+        # ?buffered=1 queues the entry for the next batched write and answers
+        # 202 without an id.
+        if request.query_params.get('buffered') != '1':
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        log_buffer.write(**serializer.validated_data)
+        return Response({"detail": "Log entry queued"}, status=status.HTTP_202_ACCEPTED)
 
-class LogsListView(generics.ListAPIView):
+
+class LogsBulkCreateView(APIView):
+    """Stores a JSON array of log entries (or {"logs": [...]}) in one insert."""
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        entries = request.data.get('logs') if isinstance(request.data, dict) else request.data
+        if not isinstance(entries, list) or not entries:
+            return Response({"error": "Send a non-empty list of log entries"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > settings.BULK_MAX_ITEMS:
+            return Response({"error": f"At most {settings.BULK_MAX_ITEMS} entries per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = LogsSerializer(data=entries, many=True)
+        serializer.is_valid(raise_exception=True)
+        logs = serializer.save()
+        return Response({"created": len(logs)}, status=status.HTTP_201_CREATED)
+
+
+class LogsListView(ConditionalListMixin, StreamingListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     queryset = Logs.objects.all().order_by('-log_date')
     serializer_class = LogsSerializer
+    user_field = 'actor'
+    pagination_class = LogCursorPagination
+    validator_field = 'log_date'
+
+
+class LogsQueryView(SparseFieldsViewMixin, generics.ListAPIView):
+    """
+    GET /api/logs/query/ filters the log by the structured columns, newest
+    first, one cursor page at a time:
+
+        ?actor=<user id>  ?action=upload,delete  ?target_type=file
+        ?target_id=<id>   ?start=YYYY-MM-DD  ?end=YYYY-MM-DD (inclusive)
+    """
+    permission_classes = [AllowAny]
+    serializer_class = LogsSerializer
+    pagination_class = LogQueryCursorPagination
+    filters = {}
+
+    def list(self, request, *args, **kwargs):
+        try:
+            self.filters = self.get_filters(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return super().list(request, *args, **kwargs)
+
+    def get_filters(self, params):
+        filters = {}
+        for param in ['actor', 'target_id']:
+            value = params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValueError(f"{param} must be an id")
+                filters[f'{param}_id' if param == 'actor' else param] = int(value)
+        actions = [a for a in params.get('action', '').split(',') if a]
+        if actions:
+            unknown = set(actions) - {choice for choice, _ in Logs.ACTION_CHOICES}
+            if unknown:
+                raise ValueError(f"Unknown action: {', '.join(sorted(unknown))}")
+            filters['action__in'] = actions
+        if params.get('target_type'):
+            filters['target_type'] = params['target_type']
+        for param, lookup, shift in [('start', 'log_date__gte', 0), ('end', 'log_date__lt', 1)]:
+            value = params.get(param)
+            if value:
+                day = parse_date(value)
+                if day is None:
+                    raise ValueError(f"{param} must be a date (YYYY-MM-DD)")
+                filters[lookup] = timezone.make_aware(
+                    datetime.combine(day + timedelta(days=shift), time.min))
+        return filters
+
+    def get_queryset(self):
+        return Logs.objects.filter(**self.filters)
+
+
+class ArchivedLogsView(APIView):
+    """
+    GET /api/logs/archive/?start=YYYY-MM-DD&end=YYYY-MM-DD streams the log
+    rows that `manage.py archive_logs` moved out of the table, oldest first.
+    """
+    permission_classes = [AllowAny]
+    max_days = 366
+
+    def get(self, request):
+        try:
+            start = parse_date(request.query_params.get('start', ''))
+            end = parse_date(request.query_params.get('end', '')) or start
+        except ValueError:  # well formed but not a real date
+            start = end = None
+        if start is None or end < start:
+            return Response({"error": "start (and optionally end) must be dates, YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= self.max_days:
+            return Response({"error": f"At most {self.max_days} days per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = LogsSerializer(context={'request': request})
+
+        def rows():
+            yield b'['
+            separator = b''
+            for row in iter_archived_logs(start, end):
+                yield separator + dumps_json(serializer.to_representation(Logs(**row)))
+                separator = b','
+            yield b']'
+
+        return StreamingHttpResponse(rows(), content_type='application/json')
 
 
 class FolderFilesTotalSizeView(APIView):
@@ -289,43 +755,177 @@ class FolderFilesTotalSizeView(APIView):
         return Response(serializer.data)
 
 
+class FileSearchView(APIView):
+    """
+    GET /api/search/?q=budget memo ranks files by file name, folder name and
+    extracted document text (every word matches as a prefix), with the hits
+    highlighted in <mark> tags. Confidential files are never returned;
+    archived ones only with ?archived=1.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = request.query_params.get('limit', '20')
+        if not limit.isdigit():
+            return Response({"error": "limit must be a positive number"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(int(limit), settings.API_MAX_PAGE_SIZE))
+
+        hits = search_files(text, limit=limit,
+                            include_archived=request.query_params.get('archived') == '1')
+        files = Folder_Files.objects.select_related('folder').in_bulk([hit['id'] for hit in hits])
+        results = []
+        for hit in hits:
+            file = files.get(hit['id'])
+            if file is not None:
+                file.rank = hit['rank']
+                file.name_highlight = hit['name_highlight']
+                file.snippet = hit['snippet']
+                results.append(file)
+
+        serializer = SearchResultSerializer(results, many=True, context={'request': request})
+        return Response({"query": text, "results": serializer.data}, status=status.HTTP_200_OK)
+
+
+class StorageUsageView(APIView):
+    """
+    Storage usage per day or month, optionally split by uploader or folder.
+
+    Reads the rollups written by `manage.py rollup_storage_usage`, so the cost
+    depends on the number of buckets rather than the number of files.
+    """
+    permission_classes = [AllowAny]
+    group_fields = {
+        'user': ['user_id', 'user__username'],
+        'folder': ['folder_id', 'folder__name'],
+        'none': [],
+    }
+
+    def get(self, request):
+        granularity = request.query_params.get('granularity', StorageUsageRollup.MONTH)
+        group_by = request.query_params.get('group_by', 'none')
+        if granularity not in dict(StorageUsageRollup.GRANULARITY_CHOICES):
+            return Response({"error": "granularity must be 'day' or 'month'"}, status=status.HTTP_400_BAD_REQUEST)
+        if group_by not in self.group_fields:
+            return Response({"error": "group_by must be 'user', 'folder' or 'none'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = StorageUsageRollup.objects.filter(granularity=granularity)
+        for param, lookup in [('start', 'bucket__gte'), ('end', 'bucket__lte')]:
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:  # well formed but not a real date
+                    day = None
+                if day is None:
+                    return Response({"error": f"{param} must be a date (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+                rollups = rollups.filter(**{lookup: day})
+        for param in ['user', 'folder']:
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({"error": f"{param} must be an id"}, status=status.HTTP_400_BAD_REQUEST)
+                rollups = rollups.filter(**{f'{param}_id': int(value)})
+
+        fields = ['bucket'] + self.group_fields[group_by]
+        totals = (rollups.values(*fields)
+                  .annotate(**{name: Sum(name) for name in [
+                      'file_count', 'bytes_uploaded',
+                      'confidential_count', 'confidential_bytes',
+                      'archive_count', 'archive_bytes',
+                      'backup_count', 'backup_bytes',
+                  ]})
+                  .order_by(*fields))
+        serializer = StorageUsageSerializer(totals, many=True)
+        return Response({
+            'granularity': granularity,
+            'group_by': group_by,
+            'results': serializer.data,
+        }, status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def convert_to_pdf(request):
+    """
+    Queues a PDF conversion of the media file or download URL at fileUrl and
+    answers 202 with the job id; poll convert-to-pdf/<job_id>/ for the PDF
+    URL. Stored files can only be converted by whoever may download them.
+    """
     file_url = request.data.get("fileUrl")
     if not file_url:
         return JsonResponse({"error": "fileUrl is required"}, status=400)
 
-    try:
-        parsed_url = urlparse(file_url)
-        file_path = os.path.join(
-            settings.MEDIA_ROOT, parsed_url.path.replace("/media/", ""))
+    source = source_from_url(file_url)
+    if source is None:
+        return JsonResponse({"error": "fileUrl must point to a media file"}, status=400)
+    token = parse_qs(urlparse(file_url).query).get('signature', [None])[0]
+    if not can_read_source(request.user, source, token):
+        return JsonResponse({"error": "You may not read this file"}, status=403)
+    if not os.path.exists(os.path.join(settings.MEDIA_ROOT, source)):
+        return JsonResponse({"error": f"File not found: {source}"}, status=404)
 
-        if not os.path.exists(file_path):
-            return JsonResponse({"error": f"File not found at {file_path}"}, status=404)
-
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            output_pdf = os.path.join(tmpdirname, "output.pdf")
-            # ⚠️ this is where most errors happen
-            convert(file_path, output_pdf)
-
-            final_pdf_path = os.path.join(
-                settings.MEDIA_ROOT,
-                "converted",
-                os.path.basename(file_path) + ".pdf"
-            )
-            os.makedirs(os.path.dirname(final_pdf_path), exist_ok=True)
-            os.replace(output_pdf, final_pdf_path)
+    try:
+        job = enqueue(source)
+    except QueueFull:
+        response = JsonResponse({"error": "Too many conversions waiting, try again later"}, status=503)
+        response["Retry-After"] = "30"
+        return response
+    return JsonResponse(conversion_status(request, job), status=202)
+
+
+def conversion_status(request, job):
+    # Jobs of protected sources hand out signed URLs, so whoever was allowed
+    # to start the job can keep polling it and fetch the result.
+    query = ''
+    if job.source.startswith(tuple(settings.PROTECTED_MEDIA_PREFIXES)):
+        query = f"?signature={sign_job(job.id)}"
+    data = {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": request.build_absolute_uri(reverse("convert-to-pdf-status", args=[job.id]) + query),
+    }
+    if job.status == ConversionJob.DONE and not os.path.exists(os.path.join(settings.MEDIA_ROOT, job.output)):
+        # Evicted from the conversion cache since; POST again to reconvert.
+        data["status"] = "expired"
+    elif job.status == ConversionJob.DONE:
+        data["pdf_url"] = request.build_absolute_uri(reverse("convert-to-pdf-result", args=[job.id]) + query)
+        data["cache_hit"] = job.cache_hit
+    elif job.status == ConversionJob.FAILED:
+        data["error"] = job.error
+    return data
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def conversion_job_status(request, job_id):
+    job = get_object_or_404(ConversionJob, id=job_id)
+    if not can_read_job(request.user, job, request.query_params.get('signature')):
+        return JsonResponse({"error": "You may not read this conversion"}, status=403)
+    return JsonResponse(conversion_status(request, job))
 
-            pdf_url = request.build_absolute_uri(
-                settings.MEDIA_URL + "converted/" +
-                os.path.basename(file_path) + ".pdf"
-            )
-            return JsonResponse({"pdf_url": pdf_url})
 
-    except Exception as e:
-        traceback.print_exc()
-        return JsonResponse({"error": str(e)}, status=500)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def conversion_job_result(request, job_id):
+    """The converted PDF, with the same access rules as the job's source."""
+    job = get_object_or_404(ConversionJob, id=job_id, status=ConversionJob.DONE)
+    if not can_read_job(request.user, job, request.query_params.get('signature')):
+        return JsonResponse({"error": "You may not read this conversion"}, status=403)
+    if not os.path.exists(os.path.join(settings.MEDIA_ROOT, job.output)):
+        return JsonResponse({"error": "The PDF has expired; convert the file again"}, status=410)
+    filename = os.path.splitext(os.path.basename(job.source))[0] + '.pdf'
+    return media_response(request, job.output, content_type='application/pdf', filename=filename,
+                          private=job.source.startswith(tuple(settings.PROTECTED_MEDIA_PREFIXES)))
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def conversion_cache_stats(request):
+    """Hit/miss counts of the conversion cache and its current size."""
+    return JsonResponse(cache_stats())
 
 
 class DeleteUserView(APIView):
@@ -337,18 +937,42 @@ class DeleteUserView(APIView):
         except User.DoesNotExist:
             return Response({"detail": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        user.delete()
+        # Files this user uploaded into other people's folders cascade away
+        # with the account, so those folders' counters must be rebuilt.
+        folder_ids = list(
+            Folder_Files.objects.filter(uploaded_by=user, folder__isnull=False)
+            .exclude(folder__created_by=user)
+            .values_list('folder_id', flat=True).distinct()
+        )
+        with transaction.atomic():
+            # Their uploads and everything in their folders go with the
+            # account; the stored files are removed by `manage.py purge_storage`.
+            reason = f"user {user.id} deleted"
+            queue_file_purge(
+                Folder_Files.objects.filter(Q(uploaded_by=user) | Q(folder__created_by=user)),
+                reason)
+            queue_profile_purge(Profile.objects.filter(user=user), reason)
+            user.delete()
+            if folder_ids:
+                recompute(folder_ids)
         return Response({"detail": "User deleted successfully"}, status=status.HTTP_200_OK)
     
     
-class NonStaffUsersView(APIView):
+class NonStaffUsersView(SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
-    
-    def get(self, request):
-        users = User.objects.filter(is_staff=False, is_superuser=False)
-        profiles = Profile.objects.filter(user__in=users)
-        serializer = ProfileSerializer(profiles, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer_class = ProfileSerializer
+    pagination_class = ProfileCursorPagination
+
+    def get_queryset(self):
+        return Profile.objects.select_related('user').filter(
+            user__is_staff=False, user__is_superuser=False)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Unpaginated, the list keeps the format it had before pagination
+        # existed: picture URLs relative to the site.
+        context['relative_media_urls'] = not self.paginator.is_requested(self.request)
+        return context
     
 class SetBackupAPIView(APIView):
     permission_classes = [AllowAny]
@@ -359,20 +983,141 @@ class SetBackupAPIView(APIView):
         except Folder_Files.DoesNotExist:
             return Response({"error": "File not found."}, status=status.HTTP_404_NOT_FOUND)
 
+        before = file_state(file_instance)
         file_instance.is_backup = True
-        file_instance.save()
+        with transaction.atomic():
+            file_instance.save()
+            record_change(before, file_state(file_instance))
         return Response({"success": f"File '{file_instance.file_name}' marked as backup."}, status=status.HTTP_200_OK)
 
-class FileBackupListView(generics.ListAPIView):
+class FileBackupListView(ConditionalListMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = FolderFilesSerializer
+    user_field = 'uploaded_by'
+    pagination_class = FileCursorPagination
 
     def get_queryset(self):
-        return Folder_Files.objects.filter(is_backup=True)
+        return Folder_Files.objects.select_related('uploaded_by').filter(is_backup=True)
     
     
     
-class FileUnbackupView(generics.UpdateAPIView):
+class FileUnbackupView(FolderStatsUpdateMixin, generics.UpdateAPIView):
     queryset = Folder_Files.objects.all()
     serializer_class = FileUbackupSerializer
-    permission_classes = [AllowAny]
\ No newline at end of file
+    permission_classes = [AllowAny]
+
+
+class BulkFileActionView(APIView):
+    """
+    Applies one action to many files: POST {"ids": [...]} or
+    {"filter": {"folder": 3, "is_archive": false}} to
+    files/bulk/<archive|unarchive|backup|unbackup|move|delete>/.
+    A move also takes the target {"folder": id}.
+
+    The change is a single UPDATE (or DELETE) over the matched rows inside a
+    transaction. Stored files of deleted rows are queued for
+    `manage.py purge_storage`. The response reports each file for `ids`,
+    and only the matched and changed counts for a `filter`.
+    """
+    permission_classes = [AllowAny]
+    flag_actions = {
+        'archive': {'is_archive': True},
+        'unarchive': {'is_archive': False},
+        'backup': {'is_backup': True},
+        'unbackup': {'is_backup': False},
+    }
+
+    def post(self, request, action):
+        if action not in self.flag_actions and action not in ('move', 'delete'):
+            return Response({"error": f"Unknown action '{action}'"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = BulkFileActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if action == 'move' and 'folder' not in data:
+            return Response({"folder": ["The target folder is required to move files."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        if action == 'move':
+            changes = {'folder_id': data['folder'].id}
+        else:
+            changes = self.flag_actions.get(action, {})
+        if 'filter' in data:
+            return self.apply_to_filter(action, data['filter'], changes)
+
+        with transaction.atomic():
+            rows = list(Folder_Files.objects.filter(id__in=data['ids']).values(
+                'id', 'file', 'folder_id', 'is_archive', 'is_backup',
+                'size_bytes', 'date_creation'))
+            matched = [row['id'] for row in rows]
+            changed = [row for row in rows
+                       if action == 'delete' or any(row[k] != v for k, v in changes.items())]
+            targets = Folder_Files.objects.filter(id__in=[row['id'] for row in changed])
+
+            stats = []
+            for row in changed:
+                before = FileState(*(row[f] for f in FileState._fields))
+                after = None if action == 'delete' else before._replace(**changes)
+                stats.append((before, after))
+
+            if action == 'delete':
+                queue_file_purge(targets, "bulk delete")
+                targets.delete()
+            elif changed:
+                targets.update(**changes, updated_at=timezone.now())
+            record_changes(stats)
+
+        changed_ids = {row['id'] for row in changed}
+        found = set(matched)
+        results = [
+            {'id': file_id,
+             'status': ('not_found' if file_id not in found
+                        else 'ok' if file_id in changed_ids else 'unchanged')}
+            for file_id in dict.fromkeys(data['ids'])
+        ]
+        return Response({
+            'action': action,
+            'matched': len(matched),
+            'changed': len(changed_ids),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+    def apply_to_filter(self, action, filters, changes):
+        # Any number of rows can match, so the statement runs on the filtered
+        # queryset itself and the response only counts them.
+        lookups = dict(filters)
+        for relation in ('folder', 'uploaded_by'):
+            if relation in lookups:
+                lookups[f'{relation}_id'] = lookups.pop(relation)
+        files = Folder_Files.objects.filter(**lookups)
+
+        with transaction.atomic():
+            matched = files.count()
+            targets = files if action == 'delete' else files.exclude(**changes)
+            deltas = bulk_change_deltas(targets, None if action == 'delete' else changes)
+            if action == 'delete':
+                queue_file_purge(targets, "bulk delete")
+                _, deleted = targets.delete()
+                changed = deleted.get(Folder_Files._meta.label, 0)
+            else:
+                changed = targets.update(**changes, updated_at=timezone.now())
+            apply_deltas(deltas)
+
+        return Response({
+            'action': action,
+            'matched': matched,
+            'changed': changed,
+        }, status=status.HTTP_200_OK)
+
+
+class StoragePurgeStatusView(APIView):
+    """How much deleted content is still waiting for `manage.py purge_storage`."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        pending = StoragePurge.objects.aggregate(
+            pending_files=Count('id'),
+            pending_bytes=Sum('size_bytes'),
+            failing_files=Count('id', filter=Q(attempts__gt=0)),
+            oldest_queued_at=Min('created_at'),
+        )
+        pending['pending_bytes'] = pending['pending_bytes'] or 0
+        return Response(pending, status=status.HTTP_200_OK)
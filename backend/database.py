@@ -0,0 +1,68 @@
+"""
+Database settings for the project, read from the environment.
+
+SQLite (the default) is tuned for concurrent uploads and log writes: WAL
+journal so readers never block the writer, a busy timeout instead of an
+immediate "database is locked", IMMEDIATE transactions so writers queue for
+the lock up front rather than deadlocking on upgrade, and persistent
+connections. Set DB_ENGINE=postgresql to switch to PostgreSQL.
+
+Environment variables:
+    DB_ENGINE            sqlite (default) or postgresql
+    DB_NAME              database name, or the SQLite file path
+    DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+                         PostgreSQL connection details
+    DB_CONN_MAX_AGE      seconds to keep a connection open (default 600)
+    SQLITE_BUSY_TIMEOUT  milliseconds to wait for the write lock (default 5000)
+    SQLITE_MMAP_SIZE     bytes of the file to memory-map (default 256 MB)
+    SQLITE_CACHE_SIZE    page cache, negative values are KiB (default -65536)
+"""
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def sqlite_pragmas():
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT', 5000)}",
+        f"PRAGMA mmap_size={_env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        f"PRAGMA cache_size={_env_int('SQLITE_CACHE_SIZE', -65536)}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def database_config(base_dir):
+    engine = os.environ.get('DB_ENGINE', 'sqlite').lower()
+    common = {
+        'CONN_MAX_AGE': _env_int('DB_CONN_MAX_AGE', 600),
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+    if engine in ('postgres', 'postgresql'):
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'egovern'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            **common,
+        }
+
+    if engine not in ('sqlite', 'sqlite3'):
+        raise ValueError(f"Unsupported DB_ENGINE {engine!r}; use sqlite or postgresql.")
+
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', base_dir / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': _env_int('SQLITE_BUSY_TIMEOUT', 5000) / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(sqlite_pragmas()),
+        },
+        **common,
+    }
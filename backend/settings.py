@@ -14,6 +14,7 @@ from pathlib import Path
 from pathlib import Path
 from datetime import timedelta
 import os
+from .database import database_config
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +39,57 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cursor pagination on list endpoints (see api/pagination.py)
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+# Most files one bulk file operation may name by id
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
+# Threads that run post-upload work (text extraction, ...) off the request
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 2))
+
+# Document conversion (api/conversion.py): worker threads, seconds allowed
+# per conversion, and how many jobs may wait before new ones are refused
+CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', 2))
+CONVERSION_TIMEOUT = int(os.environ.get('CONVERSION_TIMEOUT', 120))
+CONVERSION_MAX_PENDING = int(os.environ.get('CONVERSION_MAX_PENDING', 50))
+LIBREOFFICE_BINARY = os.environ.get('LIBREOFFICE_BINARY', '')
+# Byte budget for cached conversion results in MEDIA_ROOT/converted
+CONVERSION_CACHE_MAX_BYTES = int(os.environ.get('CONVERSION_CACHE_MAX_BYTES', 1024 ** 3))
+
+# File downloads (api/downloads.py). 'python' streams from Django with Range
+# support; 'nginx' answers with X-Accel-Redirect to FILE_DOWNLOAD_ACCEL_PREFIX,
+# which needs an internal location aliasing MEDIA_ROOT, e.g.
+#     location /protected-media/ { internal; alias /srv/egovern/media/; }
+# 'sendfile' sends X-Sendfile with the absolute path (Apache mod_xsendfile).
+FILE_DOWNLOAD_BACKEND = os.environ.get('FILE_DOWNLOAD_BACKEND', 'python')
+FILE_DOWNLOAD_ACCEL_PREFIX = os.environ.get('FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+# Lifetime in seconds of the signed download_url handed out for confidential files
+DOWNLOAD_URL_MAX_AGE = int(os.environ.get('DOWNLOAD_URL_MAX_AGE', 3600))
+# Stored files, their thumbnails and their PDF conversions live under these
+# MEDIA_ROOT prefixes and are only reachable through the permission-checked
+# endpoints. backend/urls.py does not serve them; the front server must not
+# publish them under MEDIA_URL either (with nginx, only the internal
+# FILE_DOWNLOAD_ACCEL_PREFIX location may alias them).
+PROTECTED_MEDIA_PREFIXES = ['files/', 'blobs/', 'thumbnails/', 'converted/']
+
+# Resumable uploads (api/uploads.py): staging directory for partial files,
+# largest accepted file and chunk, and idle seconds before a session expires
+UPLOAD_STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR', os.path.join(BASE_DIR, 'upload_staging'))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+UPLOAD_CHUNK_MAX_SIZE = int(os.environ.get('UPLOAD_CHUNK_MAX_SIZE', 16 * 1024 ** 2))
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+
+# Buffered log writes (api/log_buffer.py): flush after this many entries
+# or this many seconds
+LOG_BUFFER_SIZE = int(os.environ.get('LOG_BUFFER_SIZE', 100))
+LOG_BUFFER_DELAY = float(os.environ.get('LOG_BUFFER_DELAY', 2.0))
+
+# Log retention: `manage.py archive_logs` moves older rows to compressed
+# daily files in LOG_ARCHIVE_DIR
+LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 180))
+LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'log_archive'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=50),
@@ -91,10 +143,7 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
 
@@ -139,6 +188,20 @@ STATICFILES_DIR = (os.path.join(BASE_DIR, 'static'))
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads under these prefixes are stored once per content, see api/storage.py
+STORAGES = {
+    'default': {'BACKEND': 'api.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+CONTENT_ADDRESSED_PREFIXES = ['files/']
+
+# Multipart uploads are hashed, measured and type-sniffed as they stream in,
+# see api/upload_handlers.py
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.DigestingMemoryFileUploadHandler',
+    'api.upload_handlers.DigestingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
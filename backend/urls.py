@@ -1,12 +1,23 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.views.generic.base import RedirectView
+from django.views.static import serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', RedirectView.as_view(url='/api/')),
     path('api/', include('api.urls')),
     path('api-auth/', include('rest_framework.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
+
+if settings.DEBUG:
+    # Like static(), but stored files and thumbnails stay behind
+    # api/files/<id>/download/ and api/files/<id>/thumbnail/<size>/.
+    protected = '|'.join(re.escape(prefix) for prefix in settings.PROTECTED_MEDIA_PREFIXES)
+    urlpatterns += [
+        re_path(r'^%s(?!%s)(?P<path>.*)$' % (re.escape(settings.MEDIA_URL.lstrip('/')), protected),
+                serve, {'document_root': settings.MEDIA_ROOT}),
+    ]